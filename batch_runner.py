@@ -0,0 +1,116 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import cpu_count
+
+from state_machine import StateMachine, agent_seed
+from map import Map
+from metrics import TurnMetrics
+
+# NOTE: this module must never import pygame (directly or through renderer/main),
+# so that it can run on headless machines and inside worker processes.
+
+
+def play_episode(Nx: int, Ny: int, nWumpus: int, nPits: int, seed=None, max_turns=None, metrics=None,
+                 agent_args=None):
+    """
+    Plays a single episode without rendering and returns its result.
+
+    Args:
+        Nx (int): Width of the map.
+        Ny (int): Height of the map.
+        nWumpus (int): Number of wumpuses on the map.
+        nPits (int): Number of pits on the map.
+        seed: Seed of the episode. The map and the agent draw from independent streams derived
+            from it (see state_machine.agent_seed), episodes with the same seed are identical.
+        max_turns (int): Optional turn limit. If reached, the outcome is the goal the agent had at that point.
+        metrics (TurnMetrics): Optional instrumentation of the agent's turns (see metrics.py).
+        agent_args (dict): Optional keyword arguments of the StateMachine, e.g. mode or safe_forward.
+    Returns:
+        dict: 'score', 'turns' and 'outcome' ('agent won' / 'agent died') of the episode.
+    """
+    world = Map(Nx, Ny, nWumpus, nPits, seed)
+    agent = StateMachine(Nx, Ny, world, metrics=metrics, rng=agent_seed(seed), **(agent_args or {}))
+
+    goal = agent.goal
+    while goal != 'agent won' and goal != 'agent died':
+        if max_turns is not None and agent.n >= max_turns:
+            break
+        goal = agent.compute_turn(world)
+
+    return {'score': agent.score, 'turns': agent.n, 'outcome': goal}
+
+
+def _play_episode_args(args):
+    # ProcessPoolExecutor.map only passes a single argument to the worker
+    return play_episode(*args)
+
+
+def _play_block(args):
+    # Plays a block of episodes in a worker with metrics of its own. They are pickled
+    # back with the results (without exporters) and merged by the parent.
+    Nx, Ny, nWumpus, nPits, seeds, max_turns = args
+    metrics = TurnMetrics()
+    return [play_episode(Nx, Ny, nWumpus, nPits, s, max_turns, metrics) for s in seeds], metrics
+
+
+def run_episodes(Nx: int, Ny: int, nWumpus: int, nPits: int, n_episodes: int,
+                 workers=None, seed: int = 0, max_turns=None, chunksize: int = 256, metrics=None):
+    """
+    Plays n_episodes headless episodes on a process pool using all cores.
+
+    Episode i is seeded with seed + i, so a run is reproducible regardless of
+    the number of workers.
+
+    Args:
+        Nx (int): Width of the map.
+        Ny (int): Height of the map.
+        nWumpus (int): Number of wumpuses on the map.
+        nPits (int): Number of pits on the map.
+        n_episodes (int): Number of episodes to play.
+        workers (int): Number of worker processes. Defaults to the number of cores.
+        seed (int): Base seed of the run.
+        max_turns (int): Optional per episode turn limit.
+        chunksize (int): Number of episodes handed to a worker at once.
+        metrics (TurnMetrics): Optional instrumentation of every turn. With several workers,
+            every block of episodes is counted in the worker and merged into it here.
+    Returns:
+        list[dict]: Per episode results in episode order, see play_episode.
+    """
+    if workers is None:
+        workers = cpu_count()
+
+    if workers <= 1:
+        return [play_episode(Nx, Ny, nWumpus, nPits, seed + i, max_turns, metrics) for i in range(n_episodes)]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        if metrics is None:
+            jobs = ((Nx, Ny, nWumpus, nPits, seed + i, max_turns) for i in range(n_episodes))
+            return list(pool.map(_play_episode_args, jobs, chunksize=chunksize))
+
+        blocks = ((Nx, Ny, nWumpus, nPits, range(seed + k, seed + min(k + chunksize, n_episodes)), max_turns)
+                  for k in range(0, n_episodes, chunksize))
+        results = []
+        for block_results, block_metrics in pool.map(_play_block, blocks):
+            results.extend(block_results)
+            metrics.merge(block_metrics)
+        return results
+
+
+if __name__ == "__main__":
+    import time
+
+    GRID_NX = 4
+    GRID_NY = 4
+    NUM_WUMPUS = 1
+    NUM_PITS = 2
+    NUM_EPISODES = 10000
+    MAX_TURNS = 10000
+
+    start = time.perf_counter()
+    results = run_episodes(GRID_NX, GRID_NY, NUM_WUMPUS, NUM_PITS, NUM_EPISODES, max_turns=MAX_TURNS)
+    elapsed = time.perf_counter() - start
+
+    won = sum(1 for r in results if r['outcome'] == 'agent won')
+    died = sum(1 for r in results if r['outcome'] == 'agent died')
+    turns = sum(r['turns'] for r in results)
+    print(f"{NUM_EPISODES} episodes in {elapsed:.2f}s ({NUM_EPISODES / elapsed:.0f} episodes/s, {turns / elapsed:.0f} turns/s)")
+    print(f"won: {won}  died: {died}  unfinished: {NUM_EPISODES - won - died}")
@@ -0,0 +1,184 @@
+import numpy as np
+
+from grid_map import compute_percepts, CELL, START, WUMPUS, GOLD, DEADLY
+from map import GLITTER
+from map_generator import generate_layouts
+from state_machine import directions, actions, goals
+
+# action codes, see state_machine.actions
+FORWARD = actions.index('forward')
+LEFT = actions.index('left')
+RIGHT = actions.index('right')
+SHOOT = actions.index('shoot')
+GRAB = actions.index('grab')
+
+# goal codes
+GOALS = tuple(goals)
+LOOK = 0
+GO_BACK = 1
+WON = 2
+DIED = 3
+
+# unit step of every orientation, indexed like state_machine.directions
+_DX = np.array([{'east': 1, 'west': -1}.get(d, 0) for d in directions], dtype=np.int64)
+_DY = np.array([{'north': 1, 'south': -1}.get(d, 0) for d in directions], dtype=np.int64)
+
+
+class BatchedWumpusEnv:
+    """
+    Steps N worlds and N agents in lockstep using stacked NumPy arrays.
+
+    Worlds use the GridMap layout (grid and percepts of shape (N, NX, NY)) and
+    every step follows the rules of StateMachine.compute_turn, with the agent's
+    get_action replaced by the given action codes. The turn that compute_turn
+    spends on detecting a death or a win is folded into the step that caused it,
+    so scores and turn counts match compute_turn while done is reported at once.
+    """
+
+    def __init__(self, n_worlds: int, NX: int, NY: int, nWumpus: int, nPits: int, seed=None):
+        self.n_worlds = n_worlds
+        self.NX = NX
+        self.NY = NY
+        self.nWumpus = nWumpus
+        self.nPits = nPits
+        self.rng = np.random.default_rng(seed)  # stream all worlds are generated from
+
+        self.grid = np.zeros((n_worlds, NX, NY), dtype=np.uint8)
+        self.percepts = np.zeros((n_worlds, NX, NY), dtype=np.uint8)
+
+        self.start_x = np.zeros(n_worlds, dtype=np.int64)
+        self.start_y = np.zeros(n_worlds, dtype=np.int64)
+        self.pos_x = np.zeros(n_worlds, dtype=np.int64)
+        self.pos_y = np.zeros(n_worlds, dtype=np.int64)
+        self.orientation = np.zeros(n_worlds, dtype=np.int64)  # index into directions
+        self.score = np.zeros(n_worlds, dtype=np.int64)
+        self.turns = np.zeros(n_worlds, dtype=np.int64)
+        self.goal = np.zeros(n_worlds, dtype=np.int8)
+        self.heard_scream = np.zeros(n_worlds, dtype=bool)
+        self.has_arrow = np.zeros(n_worlds, dtype=bool)
+
+        self._worlds = np.arange(n_worlds)
+
+        self.reset()
+
+    @property
+    def done(self):
+        return self.goal >= WON
+
+    def observe(self):
+        """
+        Returns:
+            np.ndarray: (N,) uint8 percept bits (STENCH, BREEZE, GLITTER) at every agent's position.
+        """
+        return self.percepts[self._worlds, self.pos_x, self.pos_y] & ~np.uint8(DEADLY)
+
+    def reset(self, mask=None):
+        """
+        Generates new worlds and puts a fresh agent on their start cell.
+        Args:
+            mask (np.ndarray): Optional (N,) bool array of the worlds to reset. Defaults to all worlds.
+        Returns:
+            np.ndarray: The observation of every world, see observe.
+        """
+        if mask is None:
+            mask = np.ones(self.n_worlds, dtype=bool)
+        idx = np.flatnonzero(mask)
+
+        self.grid[idx] = generate_layouts(len(idx), self.NX, self.NY, self.nWumpus, self.nPits, self.rng)
+        self.percepts[idx] = compute_percepts(self.grid[idx])
+
+        # the start cell of every reset world
+        flat = (self.grid[idx] == START).reshape(len(idx), -1).argmax(axis=1)
+        self.start_x[idx], self.start_y[idx] = np.divmod(flat, self.NY)
+
+        self.pos_x[idx] = self.start_x[idx]
+        self.pos_y[idx] = self.start_y[idx]
+        self.orientation[idx] = directions.index('east')
+        self.score[idx] = 0
+        self.turns[idx] = 0
+        self.goal[idx] = LOOK
+        self.heard_scream[idx] = False
+        self.has_arrow[idx] = True
+
+        return self.observe()
+
+    def step(self, actions):
+        """
+        Applies one action to every world. Worlds that are done ignore their action.
+        Args:
+            actions (np.ndarray): (N,) action codes, see state_machine.actions.
+        Returns:
+            tuple: (observation, reward, done) arrays of shape (N,). The reward is the score change.
+        """
+        actions = np.asarray(actions)
+        live = self.goal < WON
+        previous_score = self.score.copy()
+
+        # forward, blocked by the edge of the map
+        forward = live & (actions == FORWARD)
+        nx = self.pos_x + _DX[self.orientation]
+        ny = self.pos_y + _DY[self.orientation]
+        moved = forward & (nx >= 0) & (nx < self.NX) & (ny >= 0) & (ny < self.NY)
+        self.pos_x[moved] = nx[moved]
+        self.pos_y[moved] = ny[moved]
+        self.score -= moved
+
+        # turns
+        right = live & (actions == RIGHT)
+        left = live & (actions == LEFT)
+        self.orientation[right] = (self.orientation[right] + 1) % len(directions)
+        self.orientation[left] = (self.orientation[left] - 1) % len(directions)
+        self.score -= right
+        self.score -= left
+
+        # shoot. Without the arrow it does nothing but still takes the turn
+        shoot = live & (actions == SHOOT)
+        armed = shoot & self.has_arrow
+        if armed.any():
+            self._shoot(np.flatnonzero(armed))
+        self.has_arrow[shoot] = False
+        self.score -= shoot
+
+        # grab. Only picking up the gold changes the goal, like apply_action
+        grab = np.flatnonzero(live & (actions == GRAB))
+        gx, gy = self.pos_x[grab], self.pos_y[grab]
+        has_gold = self.grid[grab, gx, gy] == GOLD
+        grab = grab[has_gold]
+        gx, gy = gx[has_gold], gy[has_gold]
+        self.grid[grab, gx, gy] = CELL
+        self.percepts[grab, gx, gy] &= ~np.uint8(GLITTER)
+        self.goal[grab] = GO_BACK
+
+        self.turns += live
+
+        # terminal checks of the following compute_turn
+        died = live & (self.percepts[self._worlds, self.pos_x, self.pos_y] & DEADLY).astype(bool)
+        self.goal[died] = DIED
+        self.score[died] -= 1000
+
+        won = live & ~died & (self.goal == GO_BACK) & (self.pos_x == self.start_x) & (self.pos_y == self.start_y)
+        self.goal[won] = WON
+        self.score[won] += 1000
+
+        return self.observe(), self.score - previous_score, self.done
+
+    def _shoot(self, idx):
+        # Cells on every arrow's path, ordered by distance from the agent.
+        steps = np.arange(1, max(self.NX, self.NY))
+        dx = _DX[self.orientation[idx]]
+        dy = _DY[self.orientation[idx]]
+        rx = self.pos_x[idx, None] + steps * dx[:, None]
+        ry = self.pos_y[idx, None] + steps * dy[:, None]
+
+        valid = (rx >= 0) & (rx < self.NX) & (ry >= 0) & (ry < self.NY)
+        cells = self.grid[idx[:, None], np.clip(rx, 0, self.NX - 1), np.clip(ry, 0, self.NY - 1)]
+        hits = valid & (cells == WUMPUS)
+
+        # the first wumpus on the path is killed
+        hit = hits.any(axis=1)
+        first = hits.argmax(axis=1)
+        self.heard_scream[idx] = hit
+
+        killed = idx[hit]
+        self.grid[killed, rx[hit, first[hit]], ry[hit, first[hit]]] = CELL
+        self.percepts[killed] = compute_percepts(self.grid[killed])
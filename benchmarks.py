@@ -0,0 +1,271 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+from vec2D import vec2D
+from map import Map
+from state_machine import StateMachine, agent_seed
+
+# Benchmarks of the hot paths, over grid sizes and hazard densities.
+#
+#   python benchmarks.py --out bench.json
+#   python benchmarks.py --out new.json --compare bench.json
+#
+# Every benchmark reports operations per second. The comparison flags every result
+# that got slower than the baseline by more than the threshold and exits with 1.
+
+PERCEPTS = ['', 'stench', ', breeze', 'stench, breeze', ', glitter', 'stench, glitter']
+
+
+def _measure(run, min_time):
+    # run(n) performs n operations. Grows n until one run takes at least min_time.
+    # If run has a reset attribute, it is called untimed before every run. If run
+    # returns a number, it is the time its operations took, excluding its own setup.
+    reset = getattr(run, 'reset', None)
+    n = 1
+    while True:
+        if reset is not None:
+            reset()
+        start = time.perf_counter()
+        timed = run(n)
+        elapsed = time.perf_counter() - start if timed is None else timed
+        if elapsed >= min_time:
+            return n / elapsed
+        n = max(n * 2, int(n * min_time / max(elapsed, 1e-9) * 1.2))
+
+
+def _counts(size, density):
+    # wumpus and pit counts for a density, keeping every map generatable
+    cells = size * size
+    nPits = max(1, min(int(cells * density), cells - 3))
+    nWumpus = max(1, min(int(cells * density / 10), (size - 1) * (size - 1), cells - nPits - 2))
+    return nWumpus, nPits
+
+
+def bench_map_init(size, nWumpus, nPits):
+    seeds = iter(range(1 << 62))
+
+    def run(n):
+        for _ in range(n):
+            Map(size, size, nWumpus, nPits, next(seeds))
+    return run
+
+
+def bench_get_percepts(size, nWumpus, nPits):
+    world = Map(size, size, nWumpus, nPits, 0)
+    rng = random.Random(0)
+    positions = [vec2D(rng.randrange(size), rng.randrange(size)) for _ in range(4096)]
+
+    def run(n):
+        get_percepts = world.get_percepts
+        for i in range(n):
+            get_percepts(positions[i & 4095])
+    return run
+
+
+def bench_update_state(size, nWumpus, nPits):
+    world = Map(size, size, nWumpus, nPits, 0)
+    rng = random.Random(0)
+    cases = [(vec2D(rng.randrange(size), rng.randrange(size)), rng.choice(PERCEPTS)) for _ in range(4096)]
+    state = {}
+
+    def reset():
+        # every run starts from an empty knowledge base
+        state['agent'] = StateMachine(size, size, world)
+
+    def run(n):
+        agent = state['agent']
+        for i in range(n):
+            agent.position, percepts = cases[i & 4095]
+            agent.update_state(percepts)
+    run.reset = reset
+    return run
+
+
+def bench_get_action(size, nWumpus, nPits):
+    world = Map(size, size, nWumpus, nPits, 0)
+    agent = StateMachine(size, size, world, rng=0)
+    percepts = PERCEPTS[:4]
+
+    def run(n):
+        for i in range(n):
+            agent.get_action(percepts[i & 3])
+    return run
+
+
+def bench_compute_turn(size, nWumpus, nPits):
+    state = {'seed': 0}
+
+    def new_episode():
+        state['seed'] += 1
+        state['world'] = Map(size, size, nWumpus, nPits, state['seed'])
+        state['agent'] = StateMachine(size, size, state['world'], rng=agent_seed(state['seed']))
+
+    new_episode()
+
+    def run(n):
+        # only the turns are timed, episodes ending are replaced between the timed stretches
+        elapsed = 0.0
+        done = 0
+        while done < n:
+            world = state['world']
+            compute_turn = state['agent'].compute_turn
+            over = False
+            start = time.perf_counter()
+            while done < n and not over:
+                goal = compute_turn(world)
+                done += 1
+                over = goal == 'agent won' or goal == 'agent died'
+            elapsed += time.perf_counter() - start
+            if over:
+                new_episode()
+        return elapsed
+    return run
+
+
+def bench_vec2D_add(size, nWumpus, nPits):
+    a = vec2D(size // 2, size // 2)
+    b = vec2D(1, 0)
+
+    def run(n):
+        for _ in range(n):
+            a + b
+    return run
+
+
+def bench_vec2D_hash(size, nWumpus, nPits):
+    cells = {vec2D(x, y): 0 for x in range(min(size, 64)) for y in range(min(size, 64))}
+    keys = list(cells)[:4096]
+    mask = len(keys)
+
+    def run(n):
+        for i in range(n):
+            cells[keys[i % mask]]
+    return run
+
+
+def bench_render_frame(size, nWumpus, nPits):
+    from renderer import WumpusWorldRenderer
+
+    world = Map(size, size, nWumpus, nPits, 0)
+    agent = StateMachine(size, size, world)
+    renderer = WumpusWorldRenderer(size, size, offscreen=True)
+
+    def run(n):
+        for _ in range(n):
+            renderer.render_frame(world.state, agent.position, agent.orientation, '', agent.goal,
+                                  agent.state, agent.score)
+    return run
+
+
+BENCHMARKS = {
+    'map_init': bench_map_init,
+    'get_percepts': bench_get_percepts,
+    'update_state': bench_update_state,
+    'get_action': bench_get_action,
+    'compute_turn': bench_compute_turn,
+    'vec2D_add': bench_vec2D_add,
+    'vec2D_hash': bench_vec2D_hash,
+    'render_frame': bench_render_frame,
+}
+
+
+def episode_throughput(size, nWumpus, nPits, min_time, max_turns):
+    # Plays whole episodes for at least min_time seconds
+    episodes = 0
+    turns = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < min_time:
+        world = Map(size, size, nWumpus, nPits, episodes)
+        agent = StateMachine(size, size, world, rng=agent_seed(episodes))
+        goal = agent.goal
+        while goal != 'agent won' and goal != 'agent died' and agent.n < max_turns:
+            goal = agent.compute_turn(world)
+        episodes += 1
+        turns += agent.n
+    elapsed = time.perf_counter() - start
+    return {'episodes_per_sec': episodes / elapsed, 'turns_per_sec': turns / elapsed}
+
+
+def run_benchmarks(sizes, densities, names, min_time, render_max_size, episode_max_size, max_turns):
+    results = {}
+    for size in sizes:
+        for density in densities:
+            nWumpus, nPits = _counts(size, density)
+            tag = f"{size}x{size},density={density}"
+
+            for name in names:
+                if name == 'render_frame' and size > render_max_size:
+                    continue
+                try:
+                    run = BENCHMARKS[name](size, nWumpus, nPits)
+                except ImportError as e:
+                    print(f"skipping {name}: {e}", file=sys.stderr)
+                    continue
+                ops = _measure(run, min_time)
+                results[f"{name}[{tag}]"] = {'ops_per_sec': ops}
+                print(f"{name:>14} {tag:>24} {ops:14.1f} ops/s", file=sys.stderr)
+
+            if size <= episode_max_size:
+                throughput = episode_throughput(size, nWumpus, nPits, min_time, max_turns)
+                results[f"episode[{tag}]"] = throughput
+                print(f"{'episode':>14} {tag:>24} {throughput['turns_per_sec']:14.1f} turns/s "
+                      f"{throughput['episodes_per_sec']:10.1f} episodes/s", file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Returns:
+        list[str]: One line per metric that is slower than the baseline by more than threshold.
+    """
+    regressions = []
+    for key, metrics in results.items():
+        for metric, value in metrics.items():
+            base = baseline.get(key, {}).get(metric)
+            if base and value < base * (1 - threshold):
+                regressions.append(f"{key} {metric}: {value:.1f} vs {base:.1f} ({value / base - 1:+.1%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Wumpus World hot paths.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[4, 16, 64, 256, 1024])
+    parser.add_argument('--densities', type=float, nargs='+', default=[0.05, 0.2])
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument('--min-time', type=float, default=0.2, help="seconds per measurement")
+    parser.add_argument('--render-max-size', type=int, default=32, help="largest grid to render")
+    parser.add_argument('--episode-max-size', type=int, default=64, help="largest grid to play episodes on")
+    parser.add_argument('--max-turns', type=int, default=10000, help="turn limit of every episode")
+    parser.add_argument('--out', help="write the results to this JSON file")
+    parser.add_argument('--compare', help="baseline JSON file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.1, help="allowed slowdown before flagging")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.densities, args.only, args.min_time,
+                             args.render_max_size, args.episode_max_size, args.max_turns)
+
+    if args.out:
+        report = {
+            'meta': {'python': platform.python_version(), 'platform': platform.platform(), 'time': time.time()},
+            'results': results,
+        }
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import argparse
+import os
+import sys
+import tempfile
+
+from episode_trace import TraceWriter, TraceReader, record_episode
+from map import Map
+from state_machine import StateMachine, agent_seed
+
+# Regression checks of behaviour that is easy to break without noticing.
+#
+#   python checks.py
+#   python checks.py --only trace_reader
+#
+# Every check returns a list of failures, empty when it passes. The script prints
+# them and exits with 1 if any check failed.
+
+
+def check_trace_reader():
+    """
+    Episodes read from a TraceReader are views into its memory map, closing the reader
+    (e.g. leaving its with block) must not fail while they are alive, and they must
+    stay readable.
+    """
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'check.trc')
+        with TraceWriter(path) as writer:
+            results = [record_episode(writer, 4, 4, 1, 2, seed, max_turns=200) for seed in range(3)]
+
+        try:
+            with TraceReader(path) as reader:
+                episodes = [reader[i] for i in range(len(reader))]
+        except BufferError as e:
+            return [f"closing a reader with live episodes: {e}"]
+
+        for seed, (episode, result) in enumerate(zip(episodes, results)):
+            if episode.score != result['score'] or episode.outcome != result['outcome']:
+                failures.append(f"seed {seed}: episode read back differs from the one recorded")
+        del episodes, episode  # the memory map goes with the last view, before the file is removed
+    return failures
+
+
+def check_retained_render(seeds=range(5), Nx=6, Ny=6, nWumpus=1, nPits=4, max_turns=200):
+    """
+    Plays episodes and renders every turn both retained and in full, offscreen. The
+    frames must agree pixel by pixel.
+    """
+    import numpy as np
+    import pygame
+
+    from renderer import WumpusWorldRenderer
+
+    failures = []
+    for seed in seeds:
+        world = Map(Nx, Ny, nWumpus, nPits, seed)
+        agent = StateMachine(Nx, Ny, world, rng=agent_seed(seed))
+        retained = WumpusWorldRenderer(Nx, Ny, retained=True, offscreen=True)
+        full = WumpusWorldRenderer(Nx, Ny, offscreen=True)
+
+        differing = []
+        goal = agent.goal
+        while True:
+            percepts = world.get_percepts(agent.position)
+            for renderer in (retained, full):
+                renderer.render_frame(world.state, agent.position, agent.orientation, percepts, goal,
+                                      agent.state, agent.score)
+            if not np.array_equal(retained.get_frame(copy=True), full.get_frame(copy=True)):
+                differing.append(agent.n)
+            if goal == 'agent won' or goal == 'agent died' or agent.n >= max_turns:
+                break
+            goal = agent.compute_turn(world)
+        if differing:
+            failures.append(f"seed {seed}: {len(differing)} retained frames differ from full redraws, "
+                            f"first at turn {differing[0]}")
+    pygame.quit()
+    return failures
+
+
+CHECKS = {
+    'trace_reader': check_trace_reader,
+    'retained_render': check_retained_render,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Wumpus World regression checks.")
+    parser.add_argument('--only', nargs='+', choices=list(CHECKS), default=list(CHECKS))
+    args = parser.parse_args(argv)
+
+    failed = False
+    for name in args.only:
+        try:
+            failures = CHECKS[name]()
+        except ImportError as e:
+            print(f"skipping {name}: {e}", file=sys.stderr)
+            continue
+        print(f"{name}: {'ok' if not failures else 'FAILED'}")
+        for line in failures:
+            print(f"  {line}")
+        failed = failed or bool(failures)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+import numpy as np
+
+from vec2D import vec2D
+from map import STENCH, BREEZE, GLITTER, DEADLY, STEPS
+from map_generator import CELL, START, WUMPUS, PIT, GOLD, CONTENTS
+
+# Worlds too large to build up front.
+#
+# The map is cut into square chunks of chunk_size cells. Only a few numbers are
+# drawn for the whole map: the start cell, the gold cell and how many wumpi and
+# pits every chunk holds. The cells of a chunk are generated from the seed and the
+# chunk coordinates the first time something looks at them, so memory grows with
+# the explored area and not with the size of the map. The same seed always gives
+# the same world, whatever order the chunks are generated in.
+#
+# The placement rules are the ones of Map: the start is on the west or south edge,
+# no wumpus shares a row or column with the start, and every cell holds one thing.
+
+
+class ChunkedMap:
+    """
+    A lazily generated map with the interface StateMachine plays on (get_start,
+    get_percepts, get_percept_bits, try_move, remove_gold, try_shoot).
+    """
+
+    def __init__(self, NX, NY, nWumpus, nPits, seed=None, chunk_size=64):
+        """
+        Args:
+            NX (int): Width of the map.
+            NY (int): Height of the map.
+            nWumpus (int): Number of wumpuses.
+            nPits (int): Number of pits.
+            seed: Seed, SeedSequence or np.random.Generator the whole world is derived from.
+            chunk_size (int): Width and height of a chunk in cells.
+        Raises:
+            ValueError: If the wumpuses, pits and gold don't fit on the map.
+        """
+        if nWumpus + nPits + 2 > NX * NY:
+            raise ValueError(f"{nWumpus} wumpuses and {nPits} pits don't fit on a {NX}x{NY} map")
+
+        self.NX = NX
+        self.NY = NY
+        self.chunk_size = chunk_size
+        self.chunks = {}  # (cx, cy) -> (width, height) uint8 array of cell codes
+
+        if isinstance(seed, np.random.Generator):
+            seed = int(seed.integers(1 << 63))
+        self.seed = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        rng = np.random.default_rng(self.seed)
+
+        # the start cell, on the west or south edge as in map_generator
+        x = int(rng.integers(0, NX))
+        y = int(rng.integers(0, NY))
+        if rng.integers(0, 2) == 0:
+            x = 0
+        else:
+            y = 0
+        self.start = vec2D(x, y)
+
+        # the gold, on any other cell
+        g = int(rng.integers(0, NX * NY - 1))
+        if g >= x * NY + y:
+            g += 1
+        self.gold = vec2D(*divmod(g, NY))
+
+        # cells of every chunk that may hold a wumpus, and then a pit
+        x0 = np.arange(0, NX, chunk_size)
+        y0 = np.arange(0, NY, chunk_size)
+        widths = np.minimum(chunk_size, NX - x0)
+        heights = np.minimum(chunk_size, NY - y0)
+        in_start_column = (x0 <= self.start.x) & (self.start.x < x0 + widths)
+        in_start_row = (y0 <= self.start.y) & (self.start.y < y0 + heights)
+        gold_chunk = np.zeros((len(x0), len(y0)), dtype=np.int64)
+        gold_chunk[self.gold.x // chunk_size, self.gold.y // chunk_size] = 1
+        start_chunk = np.outer(in_start_column, in_start_row).astype(np.int64)
+
+        wumpus_cells = np.outer(widths - in_start_column, heights - in_start_row)
+        if self.gold.x != self.start.x and self.gold.y != self.start.y:
+            wumpus_cells = wumpus_cells - gold_chunk
+        if nWumpus > wumpus_cells.sum():
+            raise ValueError(f"{nWumpus} wumpuses don't fit on a {NX}x{NY} map")
+
+        # number of wumpi and pits in every chunk
+        self.wumpi = rng.multivariate_hypergeometric(wumpus_cells.ravel(), nWumpus).reshape(wumpus_cells.shape)
+        pit_cells = np.outer(widths, heights) - start_chunk - gold_chunk - self.wumpi
+        self.pits = rng.multivariate_hypergeometric(pit_cells.ravel(), nPits).reshape(pit_cells.shape)
+
+    def _chunk(self, cx, cy):
+        chunk = self.chunks.get((cx, cy))
+        if chunk is None:
+            chunk = self._generate_chunk(cx, cy)
+            self.chunks[(cx, cy)] = chunk
+        return chunk
+
+    def _generate_chunk(self, cx, cy):
+        C = self.chunk_size
+        x0 = cx * C
+        y0 = cy * C
+        width = min(C, self.NX - x0)
+        height = min(C, self.NY - y0)
+        chunk = np.full((width, height), CELL, dtype=np.uint8)
+
+        for pos, code in ((self.start, START), (self.gold, GOLD)):
+            if x0 <= pos.x < x0 + width and y0 <= pos.y < y0 + height:
+                chunk[pos.x - x0, pos.y - y0] = code
+
+        # every chunk has its own stream, derived from the seed and its coordinates
+        rng = np.random.default_rng(np.random.SeedSequence(self.seed.entropy, spawn_key=self.seed.spawn_key + (cx, cy)))
+
+        xs = np.arange(x0, x0 + width)[:, None]
+        ys = np.arange(y0, y0 + height)[None, :]
+        allowed = (chunk == CELL) & (xs != self.start.x) & (ys != self.start.y)
+        cells = np.flatnonzero(allowed)
+        chunk.flat[rng.choice(cells, self.wumpi[cx, cy], replace=False)] = WUMPUS
+
+        cells = np.flatnonzero(chunk == CELL)
+        chunk.flat[rng.choice(cells, self.pits[cx, cy], replace=False)] = PIT
+        return chunk
+
+    def _code(self, x, y):
+        C = self.chunk_size
+        return self._chunk(x // C, y // C)[x % C, y % C]
+
+    def get_content(self, position):
+        """
+        Returns:
+            str: The content of a cell ('cell', 'start', 'wumpus', 'pit' or 'gold').
+        """
+        return CONTENTS[self._code(position.x, position.y)]
+
+    def get_percepts(self, position):
+        # same percepts as Map.get_percepts
+        code = self._code(position.x, position.y)
+        if code == WUMPUS or code == PIT:
+            return 'died'
+
+        stench = False
+        breeze = False
+        for c in position.neighbours():
+            if 0 <= c.x < self.NX and 0 <= c.y < self.NY:
+                neighbour = self._code(c.x, c.y)
+                stench = stench or neighbour == WUMPUS
+                breeze = breeze or neighbour == PIT
+
+        percepts = ''
+        if stench:
+            percepts += 'stench'
+        if breeze:
+            percepts += ', breeze'
+        if code == GOLD:
+            percepts += ', glitter'
+        return percepts
+
+    def get_percept_bits(self, position):
+        # same bits as Map.get_percept_bits
+        code = self._code(position.x, position.y)
+        if code == WUMPUS or code == PIT:
+            return DEADLY
+
+        bits = 0
+        for c in position.neighbours():
+            if 0 <= c.x < self.NX and 0 <= c.y < self.NY:
+                neighbour = self._code(c.x, c.y)
+                if neighbour == WUMPUS:
+                    bits |= STENCH
+                elif neighbour == PIT:
+                    bits |= BREEZE
+        if code == GOLD:
+            bits |= GLITTER
+        return bits
+
+    def try_move(self, new_position):
+        return 0 <= new_position.x < self.NX and 0 <= new_position.y < self.NY
+
+    def remove_gold(self, position):
+        C = self.chunk_size
+        chunk = self._chunk(position.x // C, position.y // C)
+        if chunk[position.x % C, position.y % C] == GOLD:
+            chunk[position.x % C, position.y % C] = CELL
+            return True
+
+    def get_start(self):
+        return self.start
+
+    def try_shoot(self, pos, orientation):
+        """
+        Shoots an arrow from pos in the given orientation, see Map.try_shoot.
+        Chunks on the arrow's path without wumpi are skipped without generating them.
+        Returns:
+            bool: True if a wumpus was killed.
+        """
+        C = self.chunk_size
+        NX = self.NX
+        NY = self.NY
+        dx, dy = STEPS[orientation]
+        x = pos.x + dx
+        y = pos.y + dy
+
+        while 0 <= x < NX and 0 <= y < NY:
+            cx = x // C
+            cy = y // C
+            if self.wumpi[cx, cy]:
+                chunk = self._chunk(cx, cy)
+                while 0 <= x < NX and 0 <= y < NY and x // C == cx and y // C == cy:
+                    if chunk[x - cx * C, y - cy * C] == WUMPUS:
+                        chunk[x - cx * C, y - cy * C] = CELL
+                        self.wumpi[cx, cy] -= 1
+                        return True
+                    x += dx
+                    y += dy
+            # on to the first cell of the next chunk along the path
+            elif dx > 0:
+                x = (cx + 1) * C
+            elif dx < 0:
+                x = cx * C - 1
+            elif dy > 0:
+                y = (cy + 1) * C
+            else:
+                y = cy * C - 1
+        return False
+
+    def get_layout(self, x0=0, y0=0, width=None, height=None):
+        """
+        Returns:
+            np.ndarray: (width, height) uint8 array of the cell codes of a window of the map,
+                the whole map by default. Generates every chunk the window touches.
+        """
+        width = self.NX - x0 if width is None else width
+        height = self.NY - y0 if height is None else height
+        C = self.chunk_size
+        layout = np.empty((width, height), dtype=np.uint8)
+        for cx in range(x0 // C, (x0 + width - 1) // C + 1):
+            for cy in range(y0 // C, (y0 + height - 1) // C + 1):
+                chunk = self._chunk(cx, cy)
+                ax = max(x0, cx * C)
+                bx = min(x0 + width, cx * C + chunk.shape[0])
+                ay = max(y0, cy * C)
+                by = min(y0 + height, cy * C + chunk.shape[1])
+                layout[ax - x0:bx - x0, ay - y0:by - y0] = chunk[ax - cx * C:bx - cx * C, ay - cy * C:by - cy * C]
+        return layout
+
+
+if __name__ == "__main__":
+    import time
+
+    from state_machine import StateMachine, agent_seed
+
+    # exploration stress test on a huge map
+    GRID_NX = 10000
+    GRID_NY = 10000
+    NUM_WUMPUS = 10000
+    NUM_PITS = 100000
+    MAX_TURNS = 100000
+    SEED = 0
+
+    start = time.perf_counter()
+    world = ChunkedMap(GRID_NX, GRID_NY, NUM_WUMPUS, NUM_PITS, SEED)
+    agent = StateMachine(GRID_NX, GRID_NY, world, rng=agent_seed(SEED))
+    setup = time.perf_counter() - start
+
+    goal = agent.goal
+    while goal != 'agent won' and goal != 'agent died' and agent.n < MAX_TURNS:
+        goal = agent.compute_turn(world)
+    elapsed = time.perf_counter() - start - setup
+
+    print(f"setup {setup:.3f}s, {agent.n} turns in {elapsed:.2f}s, outcome: {goal}")
+    print(f"chunks generated: {len(world.chunks)} of {world.wumpi.size}, cells in the belief store: {len(agent.state)}")
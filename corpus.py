@@ -0,0 +1,190 @@
+import argparse
+import os
+import struct
+import time
+from multiprocessing import Pool, cpu_count
+
+import numpy as np
+
+from grid_map import GridMap
+from map import Map
+from map_generator import generate_layout
+from solvability import analyze
+
+# Precomputed map corpora
+#
+# A corpus file holds many map layouts of one configuration, so benchmarks and
+# regression runs can play exactly the same worlds without generating them again:
+#
+#   python corpus.py maps.wcorp --count 1000000 --size 8 8 --wumpi 2 --pits 12 --seed 0
+#
+#   corpus = MapCorpus('maps.wcorp')
+#   world = corpus.map(i)
+#
+# The file is a fixed size header followed by count fixed size records
+#   seed        int64             seed the layout is generated from (generate_layout)
+#   solvable    bool              see solvability.analyze
+#   length      int32
+#   difficulty  float32
+#   grid        NX * NY uint8     cell codes (see map_generator)
+# The records are read through a memory map: opening a corpus parses the header
+# only, and map i is a view into the page cache, shared by every process reading
+# the file.
+
+MAGIC = b'WUMPCRP1'
+HEADER_SIZE = 64
+
+# count, corpus seed (-1 if none), NX, NY, nWumpus, nPits, solvable_only
+_HEADER = struct.Struct('<QqHHHH?')
+
+
+def record_dtype(NX, NY):
+    """
+    Returns:
+        np.dtype: The dtype of the records of a corpus of NX x NY maps.
+    """
+    return np.dtype([('seed', '<i8'), ('solvable', '?'), ('length', '<i4'), ('difficulty', '<f4'),
+                     ('grid', 'u1', (NX, NY))])
+
+
+def _generate_block(args):
+    # the records of a block of seeds
+    seeds, NX, NY, nWumpus, nPits, solvable_only = args
+    records = np.zeros(len(seeds), dtype=record_dtype(NX, NY))
+    records['seed'] = seeds
+    records['grid'] = [generate_layout(NX, NY, nWumpus, nPits, int(s), solvable_only) for s in seeds]
+    analysis = analyze(records['grid'])
+    for field in analysis.dtype.names:
+        records[field] = analysis[field]
+    return records
+
+
+def write_corpus(path, count, NX, NY, nWumpus, nPits, seed=None, solvable_only=False, workers=1, block=4096):
+    """
+    Generates a corpus file. The file is written next to path and moved in place when
+    complete, so readers never see a partial corpus.
+
+    Args:
+        path (str): Corpus file.
+        count (int): Number of maps.
+        seed (int): Seed the per map seeds are drawn from.
+        solvable_only (bool): Only keep solvable layouts, see map_generator.generate_layouts.
+        workers (int): Number of worker processes. None for the number of cores.
+        block (int): Maps generated per job.
+    """
+    if workers is None:
+        workers = cpu_count()
+    seeds = np.random.default_rng(seed).integers(0, 1 << 63, count, dtype=np.int64)
+
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC)
+        f.write(_HEADER.pack(count, -1 if seed is None else seed, NX, NY, nWumpus, nPits, solvable_only))
+        f.truncate(HEADER_SIZE + count * record_dtype(NX, NY).itemsize)
+
+    if count:
+        records = np.memmap(tmp, record_dtype(NX, NY), 'r+', HEADER_SIZE, (count,))
+        jobs = [(seeds[k:k + block], NX, NY, nWumpus, nPits, solvable_only) for k in range(0, count, block)]
+        if workers <= 1:
+            results = map(_generate_block, jobs)
+            pool = None
+        else:
+            pool = Pool(workers)
+            results = pool.imap(_generate_block, jobs)
+        try:
+            for k, chunk in zip(range(0, count, block), results):
+                records[k:k + len(chunk)] = chunk
+        finally:
+            if pool is not None:
+                pool.terminate()
+        records.flush()
+        del records
+    os.replace(tmp, path)
+
+
+class MapCorpus:
+    """
+    Random access to the maps of a corpus file through a memory map.
+
+    Pickling a corpus (e.g. to hand it to worker processes) only sends the path, the
+    workers map the same file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+        if header[:len(MAGIC)] != MAGIC or len(header) < HEADER_SIZE:
+            raise ValueError(f"{path} is not a map corpus")
+        (count, seed, self.NX, self.NY, self.nWumpus, self.nPits,
+         self.solvable_only) = _HEADER.unpack_from(header, len(MAGIC))
+        self.seed = None if seed == -1 else seed
+
+        self.records = np.memmap(path, record_dtype(self.NX, self.NY), 'r', HEADER_SIZE, (count,)) \
+            if count else np.zeros(0, dtype=record_dtype(self.NX, self.NY))
+
+    def __getstate__(self):
+        return self.path
+
+    def __setstate__(self, path):
+        self.__init__(path)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, i):
+        return self.layout(i)
+
+    def layout(self, i):
+        """
+        Returns:
+            np.ndarray: (NX, NY) read-only view of the cell codes of map i.
+        """
+        return self.records['grid'][i]
+
+    @property
+    def seeds(self):
+        return self.records['seed']
+
+    @property
+    def solvable(self):
+        return self.records['solvable']
+
+    def map(self, i) -> Map:
+        """
+        Returns:
+            Map: A new Map of map i.
+        """
+        return Map(self.NX, self.NY, self.nWumpus, self.nPits, layout=self.layout(i))
+
+    def grid_map(self, i) -> GridMap:
+        """
+        Returns:
+            GridMap: A new GridMap of map i, on a copy of the grid as the game changes it.
+        """
+        return GridMap(self.NX, self.NY, self.nWumpus, self.nPits, grid=np.array(self.layout(i)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a corpus of Wumpus World maps.")
+    parser.add_argument('path')
+    parser.add_argument('--count', type=int, default=100000)
+    parser.add_argument('--size', type=int, nargs=2, default=[4, 4], metavar=('NX', 'NY'))
+    parser.add_argument('--wumpi', type=int, default=1)
+    parser.add_argument('--pits', type=int, default=2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--solvable-only', action='store_true')
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    write_corpus(args.path, args.count, args.size[0], args.size[1], args.wumpi, args.pits, args.seed,
+                 args.solvable_only, args.workers)
+    elapsed = time.perf_counter() - start
+
+    corpus = MapCorpus(args.path)
+    print(f"{len(corpus)} maps written to {args.path} in {elapsed:.2f}s, {corpus.solvable.mean():.1%} solvable")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import numpy as np
+
+from grid_map import GridMap
+from map import STENCH, BREEZE, GLITTER, DEADLY, BUMP, SCREAM, STEPS, directions
+from map_generator import generate_layout
+from state_machine import actions
+
+# Gym-style environment for learners and external agents.
+#
+#   env = WumpusEnv(4, 4, 1, 2)
+#   obs, info = env.reset(seed=0)
+#   while True:
+#       obs, reward, terminated, truncated, info = env.step(policy(obs))
+#       if terminated or truncated:
+#           break
+#
+# Observations are small integers of percept bits: STENCH, BREEZE and GLITTER at the
+# agent's cell, BUMP if the last action walked into a wall and SCREAM if it killed a
+# wumpus. Observations of many episodes can be packed into one uint8 array.
+#
+# Rewards follow the scoring of StateMachine.compute_turn: every turn, shot and move
+# costs a point (bumping into a wall is free), dying costs 1000 and getting back to
+# the start with the gold earns 1000.
+
+# bits that can be set in an observation
+OBSERVATION_BITS = STENCH | BREEZE | GLITTER | BUMP | SCREAM
+
+
+class WumpusEnv:
+    """
+    A single Wumpus World episode on a GridMap, with reset(seed) / step(action).
+    """
+
+    def __init__(self, Nx: int, Ny: int, nWumpus: int, nPits: int, max_turns=None):
+        """
+        Args:
+            Nx (int): Width of the map.
+            Ny (int): Height of the map.
+            nWumpus (int): Number of wumpuses.
+            nPits (int): Number of pits.
+            max_turns (int): Optional turn limit, episodes reaching it are truncated.
+        """
+        self.Nx = Nx
+        self.Ny = Ny
+        self.nWumpus = nWumpus
+        self.nPits = nPits
+        self.max_turns = max_turns
+        self.rng = None
+        self.map = None
+
+    def reset(self, seed=None):
+        """
+        Starts a new episode.
+        Args:
+            seed: Seed, SeedSequence or np.random.Generator. Without one the maps keep
+                coming from the stream of the last seed.
+        Returns:
+            tuple: (observation, info)
+        """
+        if seed is not None or self.rng is None:
+            self.rng = np.random.default_rng(seed)
+
+        self.map = GridMap(self.Nx, self.Ny, 0, 0, grid=generate_layout(self.Nx, self.Ny, self.nWumpus, self.nPits, self.rng))
+        self.position = self.map.get_start()
+        self.orientation = 0  # index into directions, east
+        self.has_gold = False
+        self.has_arrow = True
+        self.score = 0
+        self.turns = 0
+        self.terminated = False
+        self.truncated = False
+        return self._observe(0), self._info()
+
+    def _observe(self, events):
+        return (self.map.get_percept_bits(self.position) & (STENCH | BREEZE | GLITTER)) | events
+
+    def _info(self):
+        return {'position': (self.position.x, self.position.y), 'orientation': directions[self.orientation],
+                'has_gold': self.has_gold, 'has_arrow': self.has_arrow, 'score': self.score, 'turns': self.turns}
+
+    def step(self, action):
+        """
+        Args:
+            action: Index into state_machine.actions, or the action's name.
+        Returns:
+            tuple: (observation, reward, terminated, truncated, info)
+        Raises:
+            ValueError: If the episode is over or the action is unknown.
+        """
+        if self.map is None or self.terminated or self.truncated:
+            raise ValueError("the episode is over, call reset")
+        if isinstance(action, str):
+            action = actions.index(action)
+        else:
+            action = int(action)
+            if not 0 <= action < len(actions):
+                raise ValueError(f"unknown action {action}")
+
+        reward = 0
+        events = 0
+        name = actions[action]
+        if name == 'forward':
+            dx, dy = STEPS[directions[self.orientation]]
+            new_position = self.position.offset(dx, dy)
+            if self.map.try_move(new_position):
+                self.position = new_position
+                reward -= 1
+            else:
+                events |= BUMP
+        elif name == 'right':
+            self.orientation = (self.orientation + 1) % 4
+            reward -= 1
+        elif name == 'left':
+            self.orientation = (self.orientation - 1) % 4
+            reward -= 1
+        elif name == 'shoot':
+            # without the arrow, shooting does nothing but still takes the turn
+            if self.has_arrow and self.map.try_shoot(self.position, directions[self.orientation]):
+                events |= SCREAM
+            self.has_arrow = False
+            reward -= 1
+        elif self.map.remove_gold(self.position):
+            self.has_gold = True
+        self.turns += 1
+
+        # the terminal checks of the next compute_turn
+        if self.map.get_percept_bits(self.position) & DEADLY:
+            reward -= 1000
+            self.terminated = True
+        elif self.has_gold and self.position == self.map.get_start():
+            reward += 1000
+            self.terminated = True
+        self.truncated = not self.terminated and self.max_turns is not None and self.turns >= self.max_turns
+
+        self.score += reward
+        return self._observe(events), reward, self.terminated, self.truncated, self._info()
+
+
+def decode_observation(observation):
+    """
+    Returns:
+        list[str]: The names of the bits set in an observation, e.g. ['stench', 'bump'].
+    """
+    names = ((STENCH, 'stench'), (BREEZE, 'breeze'), (GLITTER, 'glitter'), (BUMP, 'bump'), (SCREAM, 'scream'))
+    return [name for bit, name in names if observation & bit]
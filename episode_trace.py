@@ -0,0 +1,214 @@
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from state_machine import StateMachine, actions, goals, agent_seed
+from map import Map
+
+# Episode trace files
+#
+# A trace file is the magic bytes followed by episode records, appended one after
+# the other. Every record is a fixed size header followed by
+#   layout   NX * NY uint8    cell codes of the map before the first turn (see map_generator)
+#   actions  n_turns uint8    action code of every compute_turn call, NO_ACTION for the call that ended the game
+#   deltas   n_turns int16    score change of every compute_turn call
+# Records are never rewritten, so files can be appended to by later runs and read
+# through a memory map while they grow.
+
+MAGIC = b'WUMPTRC1'
+NO_ACTION = 255
+
+# seed (-1 if unknown), NX, NY, nWumpus, nPits, n_turns, outcome (goal code), padding
+_HEADER = struct.Struct('<qHHHHIB3x')
+
+
+class TraceEpisode:
+    """
+    One recorded episode. layout, actions and deltas are views into the memory map.
+    """
+
+    def __init__(self, seed, NX, NY, nWumpus, nPits, outcome, layout, actions, deltas):
+        self.seed = seed
+        self.NX = NX
+        self.NY = NY
+        self.nWumpus = nWumpus
+        self.nPits = nPits
+        self.outcome = outcome
+        self.layout = layout
+        self.actions = actions
+        self.deltas = deltas
+
+    @property
+    def n_turns(self):
+        return len(self.actions)
+
+    @property
+    def score(self):
+        return int(self.deltas.sum())
+
+
+class TraceWriter:
+    """
+    Appends episode records to a trace file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'ab')
+        if new:
+            self.file.write(MAGIC)
+
+    def write_episode(self, layout, seed, nWumpus: int, nPits: int, actions, deltas, outcome: str):
+        """
+        Args:
+            layout (np.ndarray): (NX, NY) map layout before the first turn.
+            seed (int): Seed of the episode, None if unknown.
+            actions: Action code of every turn (bytes or uint8 array).
+            deltas: Score change of every turn.
+            outcome (str): The agent's goal at the end of the episode.
+        """
+        layout = np.ascontiguousarray(layout, dtype=np.uint8)
+        actions = np.asarray(actions, dtype=np.uint8)
+        deltas = np.asarray(deltas, dtype=np.int16)
+        if len(actions) != len(deltas):
+            raise ValueError("actions and deltas must have the same length")
+
+        NX, NY = layout.shape
+        self.file.write(_HEADER.pack(-1 if seed is None else seed, NX, NY, nWumpus, nPits,
+                                     len(actions), goals.index(outcome)))
+        self.file.write(layout.tobytes())
+        self.file.write(actions.tobytes())
+        self.file.write(deltas.astype('<i2').tobytes())
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TraceReader:
+    """
+    Random access to the episodes of a trace file through a memory map.
+    Opening scans the record headers only. Episodes can outlive the reader, see close.
+    """
+
+    def __init__(self, path: str):
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a trace file")
+
+        self.offsets = []
+        offset = len(MAGIC)
+        size = len(self.map)
+        while offset + _HEADER.size <= size:
+            header = _HEADER.unpack_from(self.map, offset)
+            NX, NY, n_turns = header[1], header[2], header[5]
+            end = offset + _HEADER.size + NX * NY + 3 * n_turns
+            if end > size:
+                break  # record still being written
+            self.offsets.append(offset)
+            offset = end
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        return self.episode(i)
+
+    def episode(self, i) -> TraceEpisode:
+        offset = self.offsets[i]
+        seed, NX, NY, nWumpus, nPits, n_turns, outcome = _HEADER.unpack_from(self.map, offset)
+        offset += _HEADER.size
+
+        layout = np.frombuffer(self.map, np.uint8, NX * NY, offset).reshape(NX, NY)
+        offset += NX * NY
+        actions = np.frombuffer(self.map, np.uint8, n_turns, offset)
+        offset += n_turns
+        deltas = np.frombuffer(self.map, '<i2', n_turns, offset)
+
+        return TraceEpisode(None if seed == -1 else seed, NX, NY, nWumpus, nPits, goals[outcome],
+                            layout, actions, deltas)
+
+    def close(self):
+        """
+        Closes the file. While episodes read from it are still alive their arrays keep
+        the memory map open, it is released with the last of them.
+        """
+        try:
+            self.map.close()
+        except BufferError:
+            pass  # exported views, see the docstring
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def record_episode(writer: TraceWriter, Nx: int, Ny: int, nWumpus: int, nPits: int, seed=None,
+                   max_turns=None, mode='random'):
+    """
+    Plays an episode like batch_runner.play_episode and appends its trace to writer.
+    Returns:
+        dict: 'score', 'turns' and 'outcome' of the episode.
+    """
+    world = Map(Nx, Ny, nWumpus, nPits, seed)
+    agent = StateMachine(Nx, Ny, world, mode, rng=agent_seed(seed))
+    layout = world.get_layout()
+
+    codes = bytearray()
+    deltas = []
+    goal = agent.goal
+    while goal != 'agent won' and goal != 'agent died':
+        if max_turns is not None and agent.n >= max_turns:
+            break
+        score = agent.score
+        goal = agent.compute_turn(world)
+        codes.append(NO_ACTION if agent.last_action is None else actions.index(agent.last_action))
+        deltas.append(agent.score - score)
+
+    writer.write_episode(layout, seed, nWumpus, nPits, codes, deltas, goal)
+    return {'score': agent.score, 'turns': agent.n, 'outcome': goal}
+
+
+def replay(episode: TraceEpisode, turn=None):
+    """
+    Rebuilds the map and the agent after the given number of compute_turn calls of a
+    recorded episode. Every turn runs like compute_turn: the percepts of the replayed
+    map go through the agent's knowledge base, and the recorded action is applied in
+    place of get_action, so the agent's decision logic (and its random numbers) are
+    not needed.
+
+    Args:
+        episode (TraceEpisode): The episode to replay.
+        turn (int): Number of recorded turns to apply. Defaults to all of them.
+    Returns:
+        tuple: (Map, StateMachine) at that turn.
+    """
+    world = Map(episode.NX, episode.NY, episode.nWumpus, episode.nPits, layout=episode.layout)
+    agent = StateMachine(episode.NX, episode.NY, world)
+
+    if turn is None:
+        turn = episode.n_turns
+    for code in episode.actions[:turn]:
+        percepts = world.get_percept_bits(agent.position)
+        if agent.check_terminal(percepts) or code == NO_ACTION:
+            continue
+        if agent.goal == 'look':
+            agent.update_state(percepts)
+        agent.forced_action(percepts)  # the knowledge base update of get_action
+        agent.apply_action(world, actions[code])
+    return world, agent
@@ -0,0 +1,189 @@
+import numpy as np
+
+from map import STENCH, BREEZE, GLITTER, DEADLY, STEPS
+from map_generator import generate_layout, CELL, START, WUMPUS, PIT, GOLD, CONTENTS
+from vec2D import vec2D
+
+def _percept_string(bits):
+    # same format as Map.get_percepts
+    if bits & DEADLY:
+        return 'died'
+    percepts = ''
+    if bits & STENCH:
+        percepts += 'stench'
+    if bits & BREEZE:
+        percepts += ', breeze'
+    if bits & GLITTER:
+        percepts += ', glitter'
+    return percepts
+
+
+PERCEPT_STRINGS = tuple(_percept_string(bits) for bits in range(16))
+
+
+def adjacent(mask):
+    """
+    Returns a mask of the cells 4-adjacent to any cell set in mask.
+    Works on the last two axes, so a stack of grids can be shifted at once.
+    """
+    out = np.zeros(mask.shape, dtype=bool)
+    out[..., 1:, :] |= mask[..., :-1, :]
+    out[..., :-1, :] |= mask[..., 1:, :]
+    out[..., :, 1:] |= mask[..., :, :-1]
+    out[..., :, :-1] |= mask[..., :, 1:]
+    return out
+
+
+def compute_percepts(grid):
+    """
+    Computes the percept bits (STENCH, BREEZE, GLITTER, DEADLY) of every cell of grid.
+    Args:
+        grid (np.ndarray): uint8 array of cell codes, shape (..., NX, NY).
+    Returns:
+        np.ndarray: uint8 array of percept bits with the same shape as grid.
+    """
+    wumpus = grid == WUMPUS
+    pit = grid == PIT
+
+    percepts = np.zeros(grid.shape, dtype=np.uint8)
+    percepts[adjacent(wumpus)] |= STENCH
+    percepts[adjacent(pit)] |= BREEZE
+    percepts[grid == GOLD] |= GLITTER
+    percepts[wumpus | pit] |= DEADLY
+    return percepts
+
+
+class GridMap:
+    """
+    Array backed alternative to Map.
+
+    The world is stored as a (NX, NY) uint8 grid of cell codes. The percepts of
+    every cell are computed once with a vectorized neighbour shift and kept up to
+    date by remove_gold and try_shoot, so get_percepts is a single array lookup.
+    """
+    grid: np.ndarray
+    percepts: np.ndarray
+
+    def __init__(self, NX, NY, nWumpus, nPits, seed=None, grid=None):
+        self.NX = NX
+        self.NY = NY
+
+        if grid is None:
+            grid = generate_layout(NX, NY, nWumpus, nPits, seed)
+        self.grid = np.asarray(grid, dtype=np.uint8)
+
+        xs, ys = np.nonzero(self.grid == START)
+        self.start = vec2D(int(xs[0]), int(ys[0]))
+
+        self.percepts = compute_percepts(self.grid)
+        self._journal = None  # (x, y, old code) of every change since the first snapshot
+
+    @classmethod
+    def from_map(cls, map):
+        """
+        Builds a GridMap with the same layout as a dict backed Map.
+        """
+        codes = {content: code for code, content in enumerate(CONTENTS)}
+        grid = np.zeros((map.NX, map.NY), dtype=np.uint8)
+        for pos, content in map.state.items():
+            grid[pos.x, pos.y] = codes[content]
+        return cls(map.NX, map.NY, 0, 0, grid=grid)
+
+    def get_layout(self):
+        return self.grid.copy()
+
+    @property
+    def state(self):
+        """
+        The map as a dict[vec2D, str], in the same format as Map.state.
+        Built on every access, so only meant for the renderer and debugging.
+        """
+        return {vec2D(x, y): CONTENTS[self.grid[x, y]] for x in range(self.NX) for y in range(self.NY)}
+
+    def get_percepts(self, position):
+        return PERCEPT_STRINGS[self.percepts[position.x, position.y]]
+
+    def get_percept_bits(self, position):
+        # same bits as Map.get_percept_bits, the percepts array keeps stench and breeze on deadly cells too
+        bits = int(self.percepts[position.x, position.y])
+        return DEADLY if bits & DEADLY else bits
+
+    def try_move(self, new_position):
+        # Check if the new position is within the bounds of the map
+        return 0 <= new_position.x < self.NX and 0 <= new_position.y < self.NY
+
+    def remove_gold(self, position):
+        if self.grid[position.x, position.y] == GOLD:
+            if self._journal is not None:
+                self._journal.append((position.x, position.y, GOLD))
+            self.grid[position.x, position.y] = CELL
+            self.percepts[position.x, position.y] &= ~np.uint8(GLITTER)
+            return True
+
+    def get_start(self):
+        return self.start
+
+    def try_shoot(self, pos, orientation):
+        """
+        Shoots an arrow from pos in the given orientation ('east', 'south', 'west', 'north').
+        The first wumpus on the arrow's path is killed.
+        Returns:
+            bool: True if a wumpus was killed.
+        """
+        dx, dy = STEPS[orientation]
+        x, y = pos.x, pos.y
+
+        # cells on the arrow's path, ordered by distance from pos
+        if dx > 0:
+            ray = self.grid[x + 1:, y]
+        elif dx < 0:
+            ray = self.grid[:x, y][::-1]
+        elif dy > 0:
+            ray = self.grid[x, y + 1:]
+        else:
+            ray = self.grid[x, :y][::-1]
+
+        hits = np.flatnonzero(ray == WUMPUS)
+        if len(hits) == 0:
+            return False
+
+        k = int(hits[0]) + 1
+        wx, wy = x + k * dx, y + k * dy
+        if self._journal is not None:
+            self._journal.append((wx, wy, WUMPUS))
+        self.grid[wx, wy] = CELL
+        self._refresh_percepts(wx, wy)
+        return True
+
+    def snapshot(self):
+        """
+        Returns a token that restore() rolls the map back to, see Map.snapshot.
+        """
+        if self._journal is None:
+            self._journal = []
+        return len(self._journal)
+
+    def restore(self, snapshot):
+        """
+        Rolls the map back to a snapshot. Snapshots taken after it become invalid.
+        """
+        journal = self._journal
+        while len(journal) > snapshot:
+            x, y, code = journal.pop()
+            self.grid[x, y] = code
+            self._refresh_percepts(x, y)
+
+    def drop_snapshots(self):
+        """
+        Stops logging changes until the next snapshot.
+        """
+        self._journal = None
+
+    def _refresh_percepts(self, x, y):
+        # Recompute the percepts around a changed cell. Cells within distance 1 can
+        # change, and those depend on cells within distance 2 of (x, y).
+        x0, y0 = max(x - 2, 0), max(y - 2, 0)
+        window = compute_percepts(self.grid[x0:x + 3, y0:y + 3])
+
+        ix0, iy0 = max(x - 1, 0), max(y - 1, 0)
+        self.percepts[ix0:x + 2, iy0:y + 2] = window[ix0 - x0:x + 2 - x0, iy0 - y0:y + 2 - y0]
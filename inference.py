@@ -0,0 +1,136 @@
+class FrontierInference:
+    """
+    Exact probabilities that frontier cells hold a pit or a wumpus.
+
+    Every cell is assumed to hold a pit (wumpus) independently with the prior
+    probability. Every breeze (stench) seen adds the constraint that at least one
+    of the candidate cells around it holds a pit (wumpus). The probability of a
+    cell is the weighted share of the assignments consistent with all constraints.
+
+    Only the frontier is enumerated, split into independent connected components
+    (cells linked by a shared constraint). The result of a component depends only
+    on the shape of its constraints, so it is memoized by that signature and
+    reused across turns, agents and positions on the map.
+    """
+
+    def __init__(self, pit_prior=0.2, wumpus_prior=0.05, max_component=16, cache=None):
+        """
+        Args:
+            pit_prior (float): Prior probability of a pit in a cell.
+            wumpus_prior (float): Prior probability of a wumpus in a cell.
+            max_component (int): Components with more cells than this are approximated instead of enumerated.
+            cache (dict): Optional memo shared between instances.
+        """
+        self.pit_prior = pit_prior
+        self.wumpus_prior = wumpus_prior
+        self.max_component = max_component
+        self.cache = {} if cache is None else cache
+
+    def probabilities(self, constraints, prior):
+        """
+        Args:
+            constraints (list[tuple]): Every constraint is a tuple of cells, at least one of which is set.
+            prior (float): Prior probability of a cell being set.
+        Returns:
+            dict: Probability of every constrained cell being set.
+        """
+        result = {}
+        for cells, component in self._components(constraints):
+            result.update(zip(cells, self._solve(cells, component, prior)))
+        return result
+
+    @staticmethod
+    def _components(constraints):
+        # Groups the constraints into connected components, yields (cells, constraints) per component
+        parent = {}
+
+        def find(c):
+            while parent[c] != c:
+                parent[c] = parent[parent[c]]
+                c = parent[c]
+            return c
+
+        for constraint in constraints:
+            for c in constraint:
+                parent.setdefault(c, c)
+            for a, b in zip(constraint, constraint[1:]):
+                parent[find(a)] = find(b)
+
+        groups = {}
+        for constraint in constraints:
+            if constraint:
+                groups.setdefault(find(constraint[0]), []).append(constraint)
+
+        for component in groups.values():
+            cells = sorted({c for constraint in component for c in constraint}, key=lambda c: (c.x, c.y))
+            yield cells, component
+
+    def _solve(self, cells, constraints, prior):
+        index = {c: i for i, c in enumerate(cells)}
+        # the signature only keeps the shape of the constraints, so equal shapes share results
+        signature = (len(cells), tuple(sorted(set(tuple(sorted(index[c] for c in constraint)) for constraint in constraints))), prior)
+
+        result = self.cache.get(signature)
+        if result is None:
+            if len(cells) > self.max_component:
+                result = _approximate(*signature)
+            else:
+                result = _enumerate(*signature)
+            self.cache[signature] = result
+        return result
+
+
+def _enumerate(n, constraints, prior):
+    # Weighted model counting by backtracking over the n cells. A branch is cut as
+    # soon as a constraint has no unassigned cells left and none of them is set.
+    cell_constraints = [[] for _ in range(n)]
+    for ci, constraint in enumerate(constraints):
+        for i in constraint:
+            cell_constraints[i].append(ci)
+
+    open_cells = [len(constraint) for constraint in constraints]
+    set_cells = [0] * len(constraints)
+    assignment = [0] * n
+    weight_set = [0.0] * n
+    total = 0.0
+
+    def search(i, weight):
+        nonlocal total
+        if i == n:
+            total += weight
+            for j in range(n):
+                if assignment[j]:
+                    weight_set[j] += weight
+            return
+
+        for value, w in ((1, prior), (0, 1 - prior)):
+            ok = True
+            for ci in cell_constraints[i]:
+                open_cells[ci] -= 1
+                set_cells[ci] += value
+                if open_cells[ci] == 0 and set_cells[ci] == 0:
+                    ok = False
+            if ok:
+                assignment[i] = value
+                search(i + 1, weight * w)
+            for ci in cell_constraints[i]:
+                open_cells[ci] += 1
+                set_cells[ci] -= value
+        assignment[i] = 0
+
+    search(0, 1.0)
+    if total == 0:
+        # inconsistent constraints, nothing better to say than the prior
+        return tuple([prior] * n)
+    return tuple(w / total for w in weight_set)
+
+
+def _approximate(n, constraints, prior):
+    # Treats every constraint on its own: a cell in a constraint over k cells is set
+    # with probability prior / (1 - (1 - prior) ** k), the largest over its constraints.
+    result = [prior] * n
+    for constraint in constraints:
+        p = prior / (1 - (1 - prior) ** len(constraint))
+        for i in constraint:
+            result[i] = max(result[i], p)
+    return tuple(result)
@@ -0,0 +1,83 @@
+# Undo journals, for snapshots that cost nothing to take.
+#
+# Instead of copying a state, the containers that hold it are replaced by subclasses
+# that log the old value of every change. A snapshot is the length of the log, and
+# restoring pops the log back to that length, undoing the changes in reverse order.
+# Search code can make a move, look ahead and unmake it at the cost of the changes
+# made, however large the state is.
+#
+# Only item assignment and deletion of dicts and add/discard of sets are logged,
+# which are the only ways StateMachine and SafePathPlanner change their containers.
+
+_MISSING = object()  # old value of a key that wasn't in the dict
+_ADDED = object()    # the element wasn't in the set
+_REMOVED = object()  # the element was in the set
+
+
+class Journal:
+    """
+    The undo log shared by the journaled containers of a state.
+    """
+    __slots__ = ('entries',)
+
+    def __init__(self):
+        self.entries = []  # (container, key, old value)
+
+    def mark(self):
+        return len(self.entries)
+
+    def undo(self, mark):
+        """
+        Undoes every change logged after mark, newest first.
+        """
+        entries = self.entries
+        while len(entries) > mark:
+            container, key, old = entries.pop()
+            if old is _ADDED:
+                set.discard(container, key)
+            elif old is _REMOVED:
+                set.add(container, key)
+            elif old is _MISSING:
+                dict.__delitem__(container, key)
+            else:
+                dict.__setitem__(container, key, old)
+
+    def clear(self):
+        """
+        Forgets the logged changes. Snapshots taken before can't be restored anymore.
+        """
+        self.entries.clear()
+
+
+class JournaledDict(dict):
+    __slots__ = ('journal',)
+
+    def __init__(self, journal, items=()):
+        dict.__init__(self, items)
+        self.journal = journal
+
+    def __setitem__(self, key, value):
+        self.journal.entries.append((self, key, self.get(key, _MISSING)))
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        self.journal.entries.append((self, key, self[key]))
+        dict.__delitem__(self, key)
+
+
+class JournaledSet(set):
+    __slots__ = ('journal',)
+
+    def __init__(self, journal, items=()):
+        set.__init__(self, items)
+        self.journal = journal
+
+    def add(self, element):
+        if element not in self:
+            self.journal.entries.append((self, element, _ADDED))
+            set.add(self, element)
+
+    def discard(self, element):
+        if element in self:
+            self.journal.entries.append((self, element, _REMOVED))
+            set.discard(self, element)
@@ -6,42 +6,102 @@ import pygame
 import time
 
 
+FAST_FORWARD_KEY = pygame.K_f  # toggles fast-forward while the game runs
+FAST_FORWARD_FACTOR = 20  # how much faster turns run in fast-forward
 
-class WumpusWorldGame:
-    def __init__(self, Nx: int, Ny: int, nWumpus : int, nPits : int):
 
-        self.renderer = WumpusWorldRenderer(Nx, Ny)
-        self.clock = pygame.time.Clock()
+class WumpusWorldGame:
+    def __init__(self, Nx: int, Ny: int, nWumpus : int, nPits : int,
+                 turns_per_second=2, frames_per_second=30, fast_forward=False):
+        """
+        Args:
+            Nx (int): Width of the map.
+            Ny (int): Height of the map.
+            nWumpus (int): Number of wumpuses.
+            nPits (int): Number of pits.
+            turns_per_second (float): Simulation rate. None runs turns as fast as possible.
+            frames_per_second (float): Rendering rate, independent of the simulation rate.
+            fast_forward (bool): Start in fast-forward (FAST_FORWARD_FACTOR times the turn rate).
+        """
+
+        self.renderer = WumpusWorldRenderer(Nx, Ny, retained=True)
+
+        self.turns_per_second = turns_per_second
+        self.frames_per_second = frames_per_second
+        self.fast_forward = fast_forward
 
         self.map = Map(Nx, Ny, nWumpus, nPits) # Initialize the game map with specified dimensions and entities
         self.agent = StateMachine(Nx, Ny, self.map)  # Initialize the agent's state machine
 
+    def _turn_rate(self):
+        # turns per second, None if unlimited
+        if self.turns_per_second is None:
+            return None
+        if self.fast_forward:
+            return self.turns_per_second * FAST_FORWARD_FACTOR
+        return self.turns_per_second
 
     def run(self):
 
         # main game loop
+        # Turns run on a fixed timestep: the simulation clock advances one turn interval
+        # per turn and catches up with real time. Frames are drawn at their own rate and
+        # skipped when the loop falls behind, so rendering never slows the agent down.
         running = True
         current_goal = ''
+        frame_interval = 1.0 / self.frames_per_second
+        next_frame = time.perf_counter()
+        sim_time = next_frame  # real time up to which turns have been computed
+
         while running:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
-
-            if current_goal != 'agent won' and current_goal != 'agent died':
-                current_goal = self.agent.compute_turn(self.map)
-
-            self.renderer.render_frame(
-                self.map.state,
-                self.agent.position,
-                self.agent.orientation,
-                self.map.get_percepts(self.agent.position),
-                current_goal,
-                self.agent.state,
-                self.agent.score
-            )
-
-
-            self.clock.tick(2)
+                elif event.type == pygame.KEYDOWN and event.key == FAST_FORWARD_KEY:
+                    self.fast_forward = not self.fast_forward
+
+            now = time.perf_counter()
+            rate = self._turn_rate()
+
+            if current_goal == 'agent won' or current_goal == 'agent died':
+                sim_time = now
+            elif rate is None:
+                # unlimited: spend the time until the next frame on turns
+                while current_goal != 'agent won' and current_goal != 'agent died':
+                    current_goal = self.agent.compute_turn(self.map)
+                    if time.perf_counter() >= next_frame:
+                        break
+                sim_time = now
+            else:
+                turn_interval = 1.0 / rate
+                while sim_time + turn_interval <= now and current_goal != 'agent won' and current_goal != 'agent died':
+                    current_goal = self.agent.compute_turn(self.map)
+                    sim_time += turn_interval
+                    if time.perf_counter() >= next_frame + frame_interval:
+                        break  # let a frame through, the backlog is caught up afterwards
+
+            now = time.perf_counter()
+            if now >= next_frame:
+                self.renderer.render_frame(
+                    self.map.state,
+                    self.agent.position,
+                    self.agent.orientation,
+                    self.map.get_percepts(self.agent.position),
+                    current_goal,
+                    self.agent.state,
+                    self.agent.score
+                )
+                # skip the frames we are late for instead of drawing them back to back
+                next_frame = max(next_frame + frame_interval, now)
+
+            # sleep until the next turn or frame is due
+            if rate is not None or current_goal == 'agent won' or current_goal == 'agent died':
+                wake = next_frame
+                if rate is not None and current_goal != 'agent won' and current_goal != 'agent died':
+                    wake = min(wake, sim_time + 1.0 / rate)
+                delay = wake - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
 
         self.renderer.quit()
 
@@ -51,7 +111,10 @@ if __name__ == "__main__":
     GRID_NY = 4
     NUM_WUMPUS = 1  # Number of Wumpuses in the game
     NUM_PITS = 2  # Number of pits in the game
+    TURNS_PER_SECOND = 2  # None for as fast as possible
+    FRAMES_PER_SECOND = 30
+    FAST_FORWARD = False  # can also be toggled with the F key
 
-    game = WumpusWorldGame(GRID_NX, GRID_NY, NUM_WUMPUS, NUM_PITS)
+    game = WumpusWorldGame(GRID_NX, GRID_NY, NUM_WUMPUS, NUM_PITS, TURNS_PER_SECOND, FRAMES_PER_SECOND, FAST_FORWARD)
 
-    game.run()
\ No newline at end of file
+    game.run()
@@ -1,60 +1,128 @@
 from typing import Dict
 
+import numpy as np
+
 from vec2D import vec2D
-from random import randint
+from map_generator import generate_layout, CONTENTS
+
+# percept bits, see get_percept_bits
+STENCH = 1
+BREEZE = 2
+GLITTER = 4
+DEADLY = 8   # the cell kills the agent, get_percepts returns 'died'
+BUMP = 16    # the agent walked into a wall, only reported by step APIs (see env.py)
+SCREAM = 32  # the arrow killed a wumpus, only reported by step APIs (see env.py)
+
+directions = ['east', 'south', 'west', 'north'] # clockwise order
+
+# unit step of every orientation, as (dx, dy)
+STEPS = {'east': (1, 0), 'west': (-1, 0), 'north': (0, 1), 'south': (0, -1)}
+
+def percept_bits(percepts):
+    """
+    Converts a percept string of get_percepts to percept bits. Bits are returned unchanged,
+    so callers can take either.
+    """
+    if not isinstance(percepts, str):
+        return percepts
+    if percepts == 'died':
+        return DEADLY
+    bits = 0
+    if 'stench' in percepts:
+        bits |= STENCH
+    if 'breeze' in percepts:
+        bits |= BREEZE
+    if 'glitter' in percepts:
+        bits |= GLITTER
+    return bits
+
 
 class Map:
     state: dict[vec2D, str]
-
-    def __init__(self, NX, NY, nWumpus, nPits):
+    positions: dict[str, set[vec2D]]
+
+    def __init__(self, NX, NY, nWumpus, nPits, seed=None, layout=None):
+        """
+        Args:
+            NX (int): Width of the map.
+            NY (int): Height of the map.
+            nWumpus (int): Number of wumpuses.
+            nPits (int): Number of pits.
+            seed: Seed, SeedSequence or np.random.Generator used to generate the layout.
+            layout (np.ndarray): Optional (NX, NY) layout of cell codes to use instead of generating one.
+        """
         self.state = {}  # Dictionary to hold the state of each square
+        self.NX = NX
+        self.NY = NY
+
+        if layout is None:
+            layout = generate_layout(NX, NY, nWumpus, nPits, seed)
+
+        # index of where every entity is, kept in sync with state by _set.
+        # empty cells are not indexed
+        self.positions = {content: set() for content in CONTENTS if content != 'cell'}
+        # wumpi by row (y) and by column (x), for shooting
+        self._wumpi_in_row = {}
+        self._wumpi_in_column = {}
+        self._journal = None  # (position, old content) of every change since the first snapshot
 
         for x in range(0, NX):
             for y in range(0, NY):
                 self.state[vec2D(x, y)] = 'cell'
-
-        # select the starting cell. Has to be on the edge
-        x = randint(0, NX - 1)
-        y = randint(0, NY - 1)
-        d = randint(0, 1)
-        if d == 0:
-            start_position = vec2D(0, y)
-        else:
-            start_position = vec2D(x, 0)
-
-        self.state[start_position] = 'start'
-
-        # randomly add wumpus to cells
-        wumpus_added = 0
-        while True:
-            x = randint(0, NX - 1)
-            y = randint(0, NY - 1)
-            if x != start_position.x and y != start_position.y:
-                self.state[vec2D(x, y)] = 'wumpus'
-                wumpus_added += 1
-            if wumpus_added >= nWumpus:
-                break
-
-        # randomly add pits to cells
-        pits_added = 0
-        while True:
-            x = randint(0, NX - 1)
-            y = randint(0, NY - 1)
-            pos = vec2D(x, y)
-            if self.state[pos] != 'start' and self.state[pos] != 'wumpus':
-                self.state[vec2D(x, y)] = 'pit'
-                pits_added += 1
-            if pits_added >= nPits:
-                break
-
-        # randomly add gold
-        while True:
-            x = randint(0, NX - 1)
-            y = randint(0, NY - 1)
-            pos = vec2D(x, y)
-            if self.state[pos] != 'start' and self.state[pos] != 'wumpus' and self.state[pos] != 'pit':
-                self.state[vec2D(x, y)] = 'gold'
-                break
+                self._set(vec2D(x, y), CONTENTS[layout[x][y]])
+
+    def _set(self, pos, content):
+        old = self.state[pos]
+        if self._journal is not None:
+            self._journal.append((pos, old))
+        if old != 'cell':
+            self.positions[old].discard(pos)
+            if old == 'wumpus':
+                self._wumpi_in_row[pos.y].discard(pos)
+                self._wumpi_in_column[pos.x].discard(pos)
+
+        self.state[pos] = content
+        if content != 'cell':
+            self.positions[content].add(pos)
+            if content == 'wumpus':
+                self._wumpi_in_row.setdefault(pos.y, set()).add(pos)
+                self._wumpi_in_column.setdefault(pos.x, set()).add(pos)
+
+    def snapshot(self):
+        """
+        Returns a token that restore() rolls the map back to. Only the changes made after
+        the snapshot are logged and undone, nothing is copied.
+        """
+        if self._journal is None:
+            self._journal = []
+        return len(self._journal)
+
+    def restore(self, snapshot):
+        """
+        Rolls the map back to a snapshot. Snapshots taken after it become invalid.
+        """
+        journal = self._journal
+        self._journal = None
+        while len(journal) > snapshot:
+            pos, content = journal.pop()
+            self._set(pos, content)
+        self._journal = journal
+
+    def drop_snapshots(self):
+        """
+        Stops logging changes until the next snapshot.
+        """
+        self._journal = None
+
+    def get_layout(self):
+        """
+        Returns:
+            np.ndarray: (NX, NY) uint8 array of the cell codes in map_generator.
+        """
+        layout = np.zeros((self.NX, self.NY), dtype=np.uint8)
+        for pos, content in self.state.items():
+            layout[pos.x, pos.y] = CONTENTS.index(content)
+        return layout
 
     def get_percepts(self, position):
 
@@ -63,10 +131,7 @@ class Map:
             return 'died'
 
         # adjacent squares
-        n = position + vec2D(0, 1)
-        s = position + vec2D(0, -1)
-        e = position + vec2D(1, 0)
-        w = position + vec2D(-1, 0)
+        n, s, e, w = position.neighbours()
 
         # check for percepts in adjacent squares
         # but only within the bounds of the map
@@ -81,26 +146,67 @@ class Map:
 
         return percepts
 
+    def get_percept_bits(self, position):
+        """
+        Returns:
+            int: The percepts at position as bits (STENCH, BREEZE, GLITTER), DEADLY alone if the agent dies there.
+        """
+        state = self.state
+        content = state[position]
+        if content == 'wumpus' or content == 'pit':
+            return DEADLY
+
+        bits = 0
+        for c in position.neighbours():
+            neighbour = state.get(c)
+            if neighbour == 'wumpus':
+                bits |= STENCH
+            elif neighbour == 'pit':
+                bits |= BREEZE
+        if content == 'gold':
+            bits |= GLITTER
+        return bits
+
     def try_move(self, new_position):
         # Check if the new position is within the bounds of the map
         return new_position in self.state
 
     def remove_gold(self, position):
         if self.state[position] == 'gold':
-            self.state[position] = 'cell'
+            self._set(position, 'cell')
             return True
 
     def get_start(self):
-        for pos, content in self.state.items():
-            if content == 'start':
-                return pos
+        for pos in self.positions['start']:
+            return pos
         return None
 
     def try_shoot(self, pos, orientation):
-        wl = None
-        for pos, content in self.state.items():
-            if content == 'wumpus':
-                wl = pos
-        if (wl - pos).normalized() == orientation:
-            self.state[wl] = 'cell'
-            return True
\ No newline at end of file
+        """
+        Shoots an arrow from pos in the given orientation ('east', 'south', 'west', 'north').
+        The first wumpus on the arrow's path is killed.
+        Returns:
+            bool: True if a wumpus was killed.
+        """
+        dx, dy = STEPS[orientation]
+
+        # only the wumpi on the arrow's row or column can be hit
+        if dx != 0:
+            candidates = self._wumpi_in_row.get(pos.y, ())
+        else:
+            candidates = self._wumpi_in_column.get(pos.x, ())
+
+        # distance along the arrow's path, negative if behind the agent
+        hit = None
+        hit_distance = 0
+        for w in candidates:
+            distance = (w.x - pos.x) * dx + (w.y - pos.y) * dy
+            if distance > 0 and (hit is None or distance < hit_distance):
+                hit = w
+                hit_distance = distance
+
+        if hit is None:
+            return False
+
+        self._set(hit, 'cell')
+        return True
\ No newline at end of file
@@ -0,0 +1,137 @@
+import numpy as np
+
+# cell contents, stored as uint8 codes in map layouts
+CELL = 0
+START = 1
+WUMPUS = 2
+PIT = 3
+GOLD = 4
+CONTENTS = ('cell', 'start', 'wumpus', 'pit', 'gold')
+
+# Map layouts are (NX, NY) uint8 grids of the cell codes above.
+#
+# Entities are sampled without replacement from the cells that are allowed to hold
+# them, so generation takes a fixed amount of work, never retries and fails fast
+# with a ValueError when a configuration does not fit on the map.
+
+
+def _sample(rng, allowed, k):
+    # Picks k distinct allowed cells in every row of allowed, (count, cells) -> (count, k)
+    keys = rng.random(allowed.shape)
+    keys[~allowed] = 2.0  # never picked while enough allowed cells remain
+    if k == 0:
+        return np.zeros((allowed.shape[0], 0), dtype=np.int64)
+    return np.argpartition(keys, k - 1, axis=1)[:, :k]
+
+
+def _check_integer(name, value, low):
+    # bools are ints, but never a meaningful count
+    if isinstance(value, bool) or not isinstance(value, (int, np.integer)):
+        raise ValueError(f"{name} must be an integer, got {value!r}")
+    if value < low:
+        raise ValueError(f"{name} must be at least {low}, got {value}")
+
+
+def generate_layouts(count: int, NX: int, NY: int, nWumpus: int, nPits: int, seed=None,
+                     solvable_only=False, max_rounds=100):
+    """
+    Generates count map layouts at once, following the placement rules of Map.
+
+    Args:
+        count (int): Number of layouts.
+        NX (int): Width of the map.
+        NY (int): Height of the map.
+        nWumpus (int): Number of wumpuses per map.
+        nPits (int): Number of pits per map.
+        seed: Seed, SeedSequence or np.random.Generator. The same seed gives the same layouts.
+        solvable_only (bool): Replace the layouts without a safe path from the start to the
+            gold (see solvability.py) with new ones until every layout is solvable.
+        max_rounds (int): Rounds of replacing unsolvable layouts before giving up.
+    Returns:
+        np.ndarray: (count, NX, NY) uint8 array of layouts.
+    Raises:
+        ValueError: If a size or count isn't a non-negative integer (the map at least 1x1),
+            the wumpuses, pits and gold don't fit on the map, or no solvable layouts were
+            found in max_rounds.
+    """
+    for name, value, low in (('count', count, 0), ('NX', NX, 1), ('NY', NY, 1), ('nWumpus', nWumpus, 0), ('nPits', nPits, 0)):
+        _check_integer(name, value, low)
+    cells = NX * NY
+    # wumpuses can't share a row or column with the start cell
+    if nWumpus > (NX - 1) * (NY - 1):
+        raise ValueError(f"{nWumpus} wumpuses don't fit on a {NX}x{NY} map")
+    # every map needs a start cell and a gold cell
+    if nWumpus + nPits + 2 > cells:
+        raise ValueError(f"{nWumpus} wumpuses and {nPits} pits don't fit on a {NX}x{NY} map")
+
+    rng = np.random.default_rng(seed)
+    layouts = _generate(rng, count, NX, NY, nWumpus, nPits)
+    if solvable_only:
+        from solvability import solvable  # solvability imports the cell codes from here
+
+        bad = np.flatnonzero(~solvable(layouts))
+        rounds = 0
+        while len(bad):
+            rounds += 1
+            if rounds > max_rounds:
+                raise ValueError(f"no solvable {NX}x{NY} layouts with {nWumpus} wumpuses and {nPits} pits "
+                                 f"found in {max_rounds} rounds")
+            layouts[bad] = _generate(rng, len(bad), NX, NY, nWumpus, nPits)
+            bad = bad[~solvable(layouts[bad])]
+    return layouts
+
+
+def _generate(rng, count, NX, NY, nWumpus, nPits):
+    # the layouts of generate_layouts, the configuration is already checked
+    cells = NX * NY
+    rows = np.arange(count)[:, None]
+    cx, cy = np.divmod(np.arange(cells), NY)
+
+    # select the starting cell. Has to be on the edge
+    x = rng.integers(0, NX, count)
+    y = rng.integers(0, NY, count)
+    d = rng.integers(0, 2, count)
+    sx = np.where(d == 0, 0, x)
+    sy = np.where(d == 0, y, 0)
+
+    layouts = np.zeros((count, cells), dtype=np.uint8)
+    layouts[rows[:, 0], sx * NY + sy] = START
+
+    allowed = (cx != sx[:, None]) & (cy != sy[:, None])
+    layouts[rows, _sample(rng, allowed, nWumpus)] = WUMPUS
+
+    allowed = layouts == 0
+    layouts[rows, _sample(rng, allowed, nPits)] = PIT
+
+    allowed = layouts == 0
+    layouts[rows, _sample(rng, allowed, 1)] = GOLD
+
+    return layouts.reshape(count, NX, NY)
+
+
+def generate_layout(NX: int, NY: int, nWumpus: int, nPits: int, seed=None, solvable_only=False):
+    """
+    Generates a single map layout, see generate_layouts.
+    Returns:
+        np.ndarray: (NX, NY) uint8 layout.
+    """
+    return generate_layouts(1, NX, NY, nWumpus, nPits, seed, solvable_only)[0]
+
+
+def iter_layouts(NX: int, NY: int, nWumpus: int, nPits: int, seed=None, count=None, block: int = 1024,
+                 solvable_only=False):
+    """
+    Yields map layouts, generated block layouts at a time.
+    Args:
+        seed: Seed, SeedSequence or np.random.Generator of the whole stream.
+        count (int): Number of layouts to yield. Unlimited if None.
+        block (int): Number of layouts generated per call to generate_layouts.
+        solvable_only (bool): Only yield solvable layouts, see generate_layouts.
+    """
+    rng = np.random.default_rng(seed)
+    remaining = count
+    while remaining is None or remaining > 0:
+        n = block if remaining is None else min(block, remaining)
+        yield from generate_layouts(n, NX, NY, nWumpus, nPits, rng, solvable_only)
+        if remaining is not None:
+            remaining -= n
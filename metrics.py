@@ -0,0 +1,155 @@
+import json
+import os
+import time
+
+from state_machine import actions
+
+# Opt-in instrumentation of StateMachine.compute_turn.
+#
+#   metrics = TurnMetrics([JsonLinesExporter('metrics.jsonl'), PrometheusExporter('wumpus.prom')])
+#   agent = StateMachine(Nx, Ny, world, metrics=metrics)
+#   ... play ...
+#   metrics.export()
+#
+# Agents without metrics don't pay for any of this, compute_turn only checks for None.
+
+# phases of a turn, in the order they run
+PHASES = ('percepts', 'belief_update', 'action_selection', 'map_mutation')
+
+
+class TurnMetrics:
+    """
+    Per phase timers and per action, death and win counters of compute_turn.
+    One instance can be shared by any number of agents of a process.
+    """
+
+    def __init__(self, exporters=(), export_every=None):
+        """
+        Args:
+            exporters (list): Objects with an export(metrics) method, called by export().
+            export_every (int): Optionally call export() every this many turns.
+        """
+        self.exporters = list(exporters)
+        self.export_every = export_every
+        self.reset()
+
+    def reset(self):
+        self.turns = 0
+        self.wins = 0
+        self.deaths = 0
+        self.phase_seconds = dict.fromkeys(PHASES, 0.0)
+        self.phase_calls = dict.fromkeys(PHASES, 0)
+        self.action_counts = dict.fromkeys(actions, 0)
+
+    def add_phase(self, phase, seconds):
+        self.phase_seconds[phase] += seconds
+        self.phase_calls[phase] += 1
+
+    def add_turn(self, action):
+        self.turns += 1
+        self.action_counts[action] += 1
+        if self.export_every and self.turns % self.export_every == 0:
+            self.export()
+
+    def add_outcome(self, goal):
+        if goal == 'agent won':
+            self.wins += 1
+        elif goal == 'agent died':
+            self.deaths += 1
+
+    def merge(self, other):
+        """
+        Adds the counts of another TurnMetrics, e.g. one returned by a worker process.
+        """
+        self.turns += other.turns
+        self.wins += other.wins
+        self.deaths += other.deaths
+        for phase in PHASES:
+            self.phase_seconds[phase] += other.phase_seconds[phase]
+            self.phase_calls[phase] += other.phase_calls[phase]
+        for action in actions:
+            self.action_counts[action] += other.action_counts[action]
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: The current counts, JSON serializable.
+        """
+        return {
+            'time': time.time(),
+            'turns': self.turns,
+            'wins': self.wins,
+            'deaths': self.deaths,
+            'phase_seconds': dict(self.phase_seconds),
+            'phase_calls': dict(self.phase_calls),
+            'actions': dict(self.action_counts),
+        }
+
+    def export(self):
+        for exporter in self.exporters:
+            exporter.export(self)
+
+    def __getstate__(self):
+        # exporters hold paths of the parent process, workers only ship their counts back
+        state = self.__dict__.copy()
+        state['exporters'] = []
+        return state
+
+
+class JsonLinesExporter:
+    """
+    Appends one JSON snapshot per export to a file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def export(self, metrics):
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(metrics.snapshot()) + '\n')
+
+
+class PrometheusExporter:
+    """
+    Writes the current counts in the Prometheus text format, e.g. for the textfile
+    collector of node_exporter. The file is replaced atomically, so a scraper never
+    reads a partial file.
+    """
+
+    def __init__(self, path, prefix='wumpus'):
+        self.path = path
+        self.prefix = prefix
+
+    def render(self, metrics):
+        p = self.prefix
+        lines = [
+            f"# HELP {p}_turns_total Turns computed.",
+            f"# TYPE {p}_turns_total counter",
+            f"{p}_turns_total {metrics.turns}",
+            f"# HELP {p}_wins_total Games won.",
+            f"# TYPE {p}_wins_total counter",
+            f"{p}_wins_total {metrics.wins}",
+            f"# HELP {p}_deaths_total Games lost.",
+            f"# TYPE {p}_deaths_total counter",
+            f"{p}_deaths_total {metrics.deaths}",
+            f"# HELP {p}_actions_total Actions taken, by action.",
+            f"# TYPE {p}_actions_total counter",
+        ]
+        lines += [f'{p}_actions_total{{action="{a}"}} {n}' for a, n in metrics.action_counts.items()]
+        lines += [
+            f"# HELP {p}_phase_seconds_total Time spent in every phase of compute_turn.",
+            f"# TYPE {p}_phase_seconds_total counter",
+        ]
+        lines += [f'{p}_phase_seconds_total{{phase="{ph}"}} {s:.9f}' for ph, s in metrics.phase_seconds.items()]
+        lines += [
+            f"# HELP {p}_phase_calls_total Times every phase of compute_turn ran.",
+            f"# TYPE {p}_phase_calls_total counter",
+        ]
+        lines += [f'{p}_phase_calls_total{{phase="{ph}"}} {n}' for ph, n in metrics.phase_calls.items()]
+        return '\n'.join(lines) + '\n'
+
+    def export(self, metrics):
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(self.render(metrics))
+        os.replace(tmp, self.path)
@@ -0,0 +1,206 @@
+import time
+
+import numpy as np
+
+from map import Map
+from state_machine import StateMachine, agent_seed
+
+# Many agents exploring one shared Map.
+#
+#   world = SharedWorld(32, 32, 8, 60, nAgents=500, seed=0)
+#   outcomes = world.run(max_ticks=2000)
+#
+# Every agent is a StateMachine with its own knowledge base, all of them start on
+# the start cell. There is one gold for all of them, the first agent to grab it is
+# the only one that can win. A tick runs in two phases so that its outcome doesn't depend on
+# the order agents are looked at:
+#
+#   1. Every agent still playing perceives the world and picks an action. The world
+#      isn't changed in this phase, so all agents decide on the same state.
+#   2. The actions are applied in agent id order: first grabs and shots, the
+#      mutations of the shared map, then the moves. Gold grabbed by two agents in
+#      the same tick goes to the lower id, and a wumpus killed by a shot can't be
+#      killed again by a later one.
+#
+# Agents that died or won leave the world at the end of the tick. By default agents
+# walk through each other and every move onto another agent's cell is counted as a
+# collision. With blocking, two agents can't share a cell except the start cell
+# every agent comes from: a move into a cell that holds another agent when the move
+# is applied (lower ids move first) is replaced by a random turn, as bumping would
+# deadlock two agents walking into each other in a corridor.
+
+
+class SpatialIndex:
+    """
+    The agents on every cell, for O(1) collision and neighbourhood queries.
+    Only occupied cells are stored.
+    """
+
+    def __init__(self):
+        self.cells = {}  # vec2D -> set of agent ids
+
+    def add(self, agent_id, pos):
+        self.cells.setdefault(pos, set()).add(agent_id)
+
+    def remove(self, agent_id, pos):
+        ids = self.cells[pos]
+        ids.discard(agent_id)
+        if not ids:
+            del self.cells[pos]
+
+    def move(self, agent_id, old, new):
+        self.remove(agent_id, old)
+        self.add(agent_id, new)
+
+    def at(self, pos):
+        """
+        Returns:
+            set: Ids of the agents on pos (don't modify it).
+        """
+        return self.cells.get(pos, ())
+
+    def occupied(self, pos):
+        return pos in self.cells
+
+    def near(self, pos, radius=1):
+        """
+        Returns:
+            list: Ids of the agents within radius (Chebyshev distance) of pos, pos included.
+                Costs (2 * radius + 1)^2 lookups, however many agents there are.
+        """
+        cells = self.cells
+        found = []
+        for dx in range(-radius, radius + 1):
+            for dy in range(-radius, radius + 1):
+                ids = cells.get(pos.offset(dx, dy))
+                if ids:
+                    found.extend(ids)
+        return found
+
+
+class SharedWorld:
+    """
+    One Map and many StateMachine agents playing it at the same time.
+    """
+
+    def __init__(self, Nx: int, Ny: int, nWumpus: int, nPits: int, nAgents: int, seed=None, mode='probabilistic',
+                 blocking=False):
+        """
+        Args:
+            Nx (int): Width of the map.
+            Ny (int): Height of the map.
+            nWumpus (int): Number of wumpuses.
+            nPits (int): Number of pits.
+            nAgents (int): Number of agents.
+            seed: Seed of the world. The map, every agent and the turns of blocked agents
+                get independent streams derived from it.
+            mode (str): StateMachine mode of the agents.
+            blocking (bool): Agents can't share cells, see above.
+        """
+        self.map = Map(Nx, Ny, nWumpus, nPits, seed)
+        self.start = self.map.get_start()
+        streams = agent_seed(seed).spawn(nAgents + 1)
+        self.agents = [StateMachine(Nx, Ny, self.map, mode, rng=streams[i]) for i in range(nAgents)]
+        self.rng = np.random.default_rng(streams[-1])
+        self.blocking = blocking
+        self.index = SpatialIndex()
+        self.collisions = 0  # moves onto a cell another agent was on
+        self.playing = list(range(nAgents))  # ids of the agents still in the world, in order
+        self.ticks = 0
+        for i in self.playing:
+            self.index.add(i, self.start)
+
+    def agents_near(self, pos, radius=1):
+        """
+        Returns:
+            list[StateMachine]: The agents within radius of pos, see SpatialIndex.near.
+        """
+        return [self.agents[i] for i in self.index.near(pos, radius)]
+
+    def tick(self):
+        """
+        Plays one turn of every agent still in the world.
+        Returns:
+            int: The number of agents still in the world.
+        """
+        world = self.map
+        agents = self.agents
+        index = self.index
+
+        # phase 1: perceive and decide, nothing changes the map
+        decisions = []  # (agent id, action)
+        for i in self.playing:
+            agent = agents[i]
+            percepts = world.get_percept_bits(agent.position)
+            if agent.goal == 'look':
+                agent.update_state(percepts)
+            decisions.append((i, agent.get_action(percepts)))
+
+        # phase 2: shared mutations, then moves, in id order
+        for i, action in decisions:
+            if action == 'grab' or action == 'shoot':
+                agents[i].apply_action(world, action)
+
+        for i, action in decisions:
+            if action == 'grab' or action == 'shoot':
+                continue
+            agent = agents[i]
+            if action != 'forward':
+                agent.apply_action(world, action)
+                continue
+            old = agent.position
+            new = agent.immediate_square(agent.orientation)
+            if new != self.start and index.occupied(new):
+                if self.blocking:
+                    agent.apply_action(world, 'left' if self.rng.integers(2) else 'right')
+                    continue
+                self.collisions += 1
+            agent.apply_action(world, action)
+            if agent.position != old:
+                index.move(i, old, agent.position)
+
+        # the terminal checks compute_turn would run at the start of the next turn
+        playing = []
+        for i in self.playing:
+            agent = agents[i]
+            if agent.check_terminal(world.get_percept_bits(agent.position)):
+                index.remove(i, agent.position)
+            else:
+                playing.append(i)
+        self.playing = playing
+        self.ticks += 1
+        return len(self.playing)
+
+    def run(self, max_ticks=None):
+        """
+        Ticks until every agent died or won, or max_ticks.
+        Returns:
+            dict: Number of agents per goal, e.g. {'agent won': 1, 'agent died': 40, 'look': 459}.
+        """
+        while self.playing and (max_ticks is None or self.ticks < max_ticks):
+            self.tick()
+        return self.outcomes()
+
+    def outcomes(self):
+        counts = {}
+        for agent in self.agents:
+            counts[agent.goal] = counts.get(agent.goal, 0) + 1
+        return counts
+
+
+if __name__ == "__main__":
+    GRID_NX = 32
+    GRID_NY = 32
+    NUM_WUMPUS = 8
+    NUM_PITS = 60
+    NUM_AGENTS = 500
+    MAX_TICKS = 1000
+    SEED = 0
+
+    start = time.perf_counter()
+    world = SharedWorld(GRID_NX, GRID_NY, NUM_WUMPUS, NUM_PITS, NUM_AGENTS, SEED, mode='random', blocking=True)
+    outcomes = world.run(MAX_TICKS)
+    elapsed = time.perf_counter() - start
+
+    print(f"{NUM_AGENTS} agents, {world.ticks} ticks in {elapsed:.2f}s, {world.collisions} collisions")
+    print(", ".join(f"{goal}: {n}" for goal, n in sorted(outcomes.items())))
@@ -0,0 +1,183 @@
+from collections import deque
+
+from map import directions, STEPS
+from journal import JournaledDict, JournaledSet
+
+# unit step of every orientation, indexed like directions
+_STEPS = [STEPS[d] for d in directions]
+
+
+class SafePathPlanner:
+    """
+    Shortest paths to a goal cell through cells known to be safe.
+
+    Keeps a distance field over (cell, orientation) states: the number of turns
+    ('forward', 'left' or 'right', one point each) needed to reach the goal. The
+    field is cached and updated incrementally as cells are added, so asking for
+    the next action is a handful of dict lookups.
+    """
+
+    def __init__(self, goal):
+        self.goal = goal
+        self.passable = set()
+        self.distance = {}  # (vec2D, orientation index) -> number of turns to the goal
+
+    def start_journal(self, journal):
+        """
+        Logs every later change of the distance field to journal, see journal.py.
+        """
+        self.passable = JournaledSet(journal, self.passable)
+        self.distance = JournaledDict(journal, self.distance)
+
+    def add_cell(self, pos):
+        """
+        Marks pos as passable and updates the distance field.
+        Distances only ever shrink when cells are added, so only states whose
+        distance improves are revisited.
+        """
+        if pos in self.passable:
+            return
+        self.passable.add(pos)
+
+        queue = deque()
+        if pos == self.goal:
+            for o in range(4):
+                self.distance[(pos, o)] = 0
+                queue.append((pos, o))
+        else:
+            # the states the new cell can reach in one turn
+            for o in range(4):
+                dx, dy = _STEPS[o]
+                succ = (pos.offset(dx, dy), o)
+                if succ in self.distance:
+                    queue.append(succ)
+
+        while queue:
+            state = queue.popleft()
+            d = self.distance[state] + 1
+            for pred in self._predecessors(state):
+                if d < self.distance.get(pred, d + 1):
+                    self.distance[pred] = d
+                    queue.append(pred)
+
+    def _predecessors(self, state):
+        # the states that reach state in one turn
+        pos, o = state
+        dx, dy = _STEPS[o]
+        back = pos.offset(-dx, -dy)
+        if back in self.passable:
+            yield back, o
+        yield pos, (o - 1) % 4  # turned right
+        yield pos, (o + 1) % 4  # turned left
+
+    def distance_to_goal(self, position, orientation):
+        """
+        Returns:
+            int: The number of turns to the goal, or None if it can't be reached through passable cells.
+        """
+        return self.distance.get((position, directions.index(orientation)))
+
+    def next_action(self, position, orientation):
+        """
+        Returns the first action of a shortest path to the goal.
+        Returns:
+            str: 'forward', 'left' or 'right', or None if the goal is reached or can't be reached.
+        """
+        o = directions.index(orientation)
+        d = self.distance.get((position, o))
+        if not d:
+            return None
+
+        dx, dy = _STEPS[o]
+        if self.distance.get((position.offset(dx, dy), o)) == d - 1:
+            return 'forward'
+        if self.distance.get((position, (o + 1) % 4)) == d - 1:
+            return 'right'
+        return 'left'
+
+    def plan(self, position, orientation):
+        """
+        Returns:
+            list[str]: The actions of a shortest path to the goal, empty if there is none.
+        """
+        path = []
+        action = self.next_action(position, orientation)
+        while action is not None:
+            path.append(action)
+            o = directions.index(orientation)
+            if action == 'forward':
+                dx, dy = _STEPS[o]
+                position = position.offset(dx, dy)
+            elif action == 'right':
+                orientation = directions[(o + 1) % 4]
+            else:
+                orientation = directions[(o - 1) % 4]
+            action = self.next_action(position, orientation)
+        return path
+
+
+def first_action(position, orientation, passable, targets):
+    """
+    Returns the first action of a shortest path from (position, orientation) to any of
+    the target cells. Every cell on the way must be passable, the target itself need not be.
+    Returns:
+        str: 'forward', 'left' or 'right', or None if no target can be reached.
+    """
+    if position in targets:
+        return None
+
+    start = (position, directions.index(orientation))
+    first = {start: None}  # first action taken to reach every state
+    queue = deque([start])
+    while queue:
+        state = queue.popleft()
+        pos, o = state
+        dx, dy = _STEPS[o]
+        ahead = pos.offset(dx, dy)
+
+        for action, succ in (('forward', (ahead, o)), ('right', (pos, (o + 1) % 4)), ('left', (pos, (o - 1) % 4))):
+            if succ in first:
+                continue
+            if action == 'forward':
+                if ahead in targets:
+                    return first[state] or action
+                if ahead not in passable:
+                    continue
+            first[succ] = first[state] or action
+            queue.append(succ)
+    return None
+
+
+def paths_to(position, orientation, passable, targets, k=None):
+    """
+    Shortest paths from (position, orientation) to the k nearest target cells, with the
+    same rules as first_action.
+    Returns:
+        dict[vec2D, list[str]]: The actions of the path to every target reached, nearest first.
+    """
+    start = (position, directions.index(orientation))
+    parent = {start: None}  # state -> (previous state, action)
+    paths = {}
+    queue = deque([start])
+    while queue and (k is None or len(paths) < k):
+        state = queue.popleft()
+        pos, o = state
+        dx, dy = _STEPS[o]
+        ahead = pos.offset(dx, dy)
+
+        if ahead in targets and ahead not in paths:
+            path = ['forward']
+            s = state
+            while parent[s] is not None:
+                s, action = parent[s]
+                path.append(action)
+            paths[ahead] = path[::-1]
+            if k is not None and len(paths) >= k:
+                break
+
+        for action, succ in (('forward', (ahead, o)), ('right', (pos, (o + 1) % 4)), ('left', (pos, (o - 1) % 4))):
+            if succ in parent or (action == 'forward' and ahead not in passable):
+                continue
+            parent[succ] = (state, action)
+            queue.append(succ)
+    return paths
@@ -1,6 +1,8 @@
+import os
 import pygame
 import math
 from vec2D import vec2D
+from state_machine import SAFE
 
 
 class WumpusWorldRenderer:
@@ -8,7 +10,18 @@ class WumpusWorldRenderer:
     Handles all visual rendering for the Wumpus World.
     """
 
-    def __init__(self, Nx: int, Ny: int):
+    def __init__(self, Nx: int, Ny: int, retained: bool = False, offscreen: bool = False):
+        """
+        Args:
+            Nx (int): Width of the map.
+            Ny (int): Height of the map.
+            retained (bool): Keep the last frame and only redraw the cells, agent and text that
+                changed, updating just those rectangles of the display.
+            offscreen (bool): Render into a plain surface without opening a window, using SDL's
+                dummy video driver unless another one is set. Frames are read with get_frame.
+        """
+        if offscreen:
+            os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
         pygame.init()
 
         self.Nx = Nx
@@ -35,13 +48,26 @@ class WumpusWorldRenderer:
         self.SCREEN_WIDTH = self.GRID_WIDTH + 2 * self.MARGIN
         self.SCREEN_HEIGHT = self.GRID_HEIGHT + 2 * self.MARGIN + self.TEXT_AREA_HEIGHT
 
-        self.screen = pygame.display.set_mode((self.SCREEN_WIDTH, self.SCREEN_HEIGHT))
-        pygame.display.set_caption("Wumpus World Demonstration")
+        self.offscreen = offscreen
+        if offscreen:
+            self.screen = pygame.Surface((self.SCREEN_WIDTH, self.SCREEN_HEIGHT))
+        else:
+            self.screen = pygame.display.set_mode((self.SCREEN_WIDTH, self.SCREEN_HEIGHT))
+            pygame.display.set_caption("Wumpus World Demonstration")
 
 
         self.font_grid = pygame.font.Font(None, self.FONT_SIZE_GRID)
         self.font_text = pygame.font.Font(None, self.FONT_SIZE_TEXT)
 
+        self._text_cache = {}  # (font, text, color) -> rendered surface
+        self._agent_triangles = self._bake_agent_triangles()
+
+        self.retained = retained
+        self._background = None  # blank screen with the grid lines, baked on the first retained frame
+        self._drawn_cells = {}  # vec2D -> (content, known, belief flags) as currently on screen
+        self._drawn_agent = None  # (position, direction) as currently on screen
+        self._drawn_text = None  # (score, percepts, goal) as currently on screen
+
     def _get_cell_rect(self, x: int, y: int) -> pygame.Rect:
         # Pygame's y-axis is inverted, so we adjust for grid (0,0) being bottom-left
         # In Pygame, (0,0) is top-left.
@@ -50,20 +76,49 @@ class WumpusWorldRenderer:
         pygame_y = self.MARGIN + (self.Ny - 1 - y) * self.CELL_SIZE
         return pygame.Rect(pygame_x, pygame_y, self.CELL_SIZE, self.CELL_SIZE)
 
-    def _draw_grid(self):
+    def _text(self, font, text: str, color) -> pygame.Surface:
+        # font.render is slow, so every (font, text, color) is only rendered once
+        key = (id(font), text, color)
+        surface = self._text_cache.get(key)
+        if surface is None:
+            if len(self._text_cache) > 4096:
+                self._text_cache.clear()  # scores keep changing, don't grow without bound
+            surface = font.render(text, True, color)
+            self._text_cache[key] = surface
+        return surface
+
+    def _bake_agent_triangles(self):
+        # Triangle points relative to the cell center for every direction, rotated once
+        half_size = self.AGENT_SIZE / 2
+        points = [
+            (0, -half_size),  # Top point
+            (-half_size, half_size),  # Bottom-left
+            (half_size, half_size)  # Bottom-right
+        ]
+
+        triangles = {}
+        for direction, angle in (('north', 0), ('east', 90), ('south', 180), ('west', 270)):
+            cos = math.cos(math.radians(angle))
+            sin = math.sin(math.radians(angle))
+            triangles[direction] = [(px * cos - py * sin, px * sin + py * cos) for px, py in points]
+        return triangles
+
+    def _draw_grid(self, surface=None):
+        if surface is None:
+            surface = self.screen
         for x in range(self.Nx + 1):
             start_x = self.MARGIN + x * self.CELL_SIZE
             end_x = start_x
             start_y = self.MARGIN
             end_y = self.MARGIN + self.GRID_HEIGHT
-            pygame.draw.line(self.screen, self.DARK_GRAY, (start_x, start_y), (end_x, end_y), 1)
+            pygame.draw.line(surface, self.DARK_GRAY, (start_x, start_y), (end_x, end_y), 1)
 
         for y in range(self.Ny + 1):
             start_x = self.MARGIN
             end_x = self.MARGIN + self.GRID_WIDTH
             start_y = self.MARGIN + y * self.CELL_SIZE
             end_y = start_y
-            pygame.draw.line(self.screen, self.DARK_GRAY, (start_x, start_y), (end_x, end_y), 1)
+            pygame.draw.line(surface, self.DARK_GRAY, (start_x, start_y), (end_x, end_y), 1)
 
     def _draw_cell_content(self, pos: vec2D, content: str):
         rect = self._get_cell_rect(pos.x, pos.y)
@@ -73,13 +128,13 @@ class WumpusWorldRenderer:
         color = self.BLACK
 
         if content == 'wumpus':
-            text_surface = self.font_grid.render("W", True, self.RED)
+            text_surface = self._text(self.font_grid, "W", self.RED)
             color = self.RED
         elif content == 'pit':
-            text_surface = self.font_grid.render("P", True, self.BROWN)
+            text_surface = self._text(self.font_grid, "P", self.BROWN)
             color = self.BROWN
         elif content == 'gold':
-            text_surface = self.font_grid.render("G", True, self.YELLOW)
+            text_surface = self._text(self.font_grid, "G", self.YELLOW)
             color = self.YELLOW
 
         if text_surface:
@@ -92,7 +147,7 @@ class WumpusWorldRenderer:
         rect = self._get_cell_rect(pos.x, pos.y)
         center_x, center_y = rect.center
         surface = None
-        if content == 'safe':
+        if content & SAFE:
             surface = pygame.draw.rect(self.screen, self.GREEN, rect.inflate(-10, -10), 2)
         else:
             surface = pygame.draw.rect(self.screen, self.RED, rect.inflate(-10, -10), 2)
@@ -101,34 +156,8 @@ class WumpusWorldRenderer:
         rect = self._get_cell_rect(pos.x, pos.y)
         center_x, center_y = rect.center
 
-        # Define triangle points relative to its center
-        half_size = self.AGENT_SIZE / 2
-        points = [
-            (center_x, center_y - half_size),  # Top point
-            (center_x - half_size, center_y + half_size),  # Bottom-left
-            (center_x + half_size, center_y + half_size)  # Bottom-right
-        ]
-
-        # Determine rotation angle based on direction
-        angle = 0  # Default: north (up)
-        if direction == 'east':
-            angle = 90
-        elif direction == 'south':
-            angle = 180
-        elif direction == 'west':
-            angle = 270
-
-        # Rotate points around the center
-        rotated_points = []
-        for px, py in points:
-            # Translate point to origin
-            temp_x = px - center_x
-            temp_y = py - center_y
-            # Rotate
-            rotated_x = temp_x * math.cos(math.radians(angle)) - temp_y * math.sin(math.radians(angle))
-            rotated_y = temp_x * math.sin(math.radians(angle)) + temp_y * math.cos(math.radians(angle))
-            # Translate back
-            rotated_points.append((rotated_x + center_x, rotated_y + center_y))
+        # Translate the pre-rotated triangle to the cell
+        rotated_points = [(px + center_x, py + center_y) for px, py in self._agent_triangles[direction]]
 
         pygame.draw.polygon(self.screen, self.BLUE, rotated_points)
         pygame.draw.polygon(self.screen, self.BLACK, rotated_points, 2)  # Border
@@ -137,16 +166,16 @@ class WumpusWorldRenderer:
         area_start_y = self.MARGIN + self.GRID_HEIGHT + self.MARGIN + y_offset
 
         # Draw label
-        label_surface = self.font_text.render(text_label, True, self.BLACK)
+        label_surface = self._text(self.font_text, text_label, self.BLACK)
         self.screen.blit(label_surface, (self.MARGIN, area_start_y))
 
         # Draw content
-        content_surface = self.font_text.render(text_content, True, self.BLUE)
+        content_surface = self._text(self.font_text, text_content, self.BLUE)
         self.screen.blit(content_surface, (self.MARGIN + label_surface.get_width() + 10, area_start_y))
 
 
     def render_frame(self, map_state: dict[vec2D, str], agent_position: vec2D, agent_direction: str, percepts: str,
-                     goal: str, agent_state : dict[vec2D, str], score: int = 0):
+                     goal: str, agent_state : dict[vec2D, int], score: int = 0):
         """
         Renders the entire game frame.
 
@@ -156,9 +185,13 @@ class WumpusWorldRenderer:
             agent_direction (str): The current direction of the agent ('north', 'east', 'south', 'west').
             percepts (str): String representing the current percepts.
             goal (str): String representing the current goal.
-            agent_state (dict[vec2D, str]): Dictionary mapping vec2D positions to agent state ('safe', 'unsafe').
+            agent_state (dict[vec2D, int]): Dictionary mapping vec2D positions to the agent's belief flags (see state_machine).
             score (int): Current score of the agent.
         """
+        if self.retained:
+            self._render_retained(map_state, agent_position, agent_direction, percepts, goal, agent_state, score)
+            return
+
         self.screen.fill(self.WHITE)  # Clear screen
 
         self._draw_grid()
@@ -167,13 +200,21 @@ class WumpusWorldRenderer:
         for pos, content in map_state.items():
             self._draw_cell_content(pos, content)
 
-        for pos, content in agent_state.items():
-            self._draw_cell_agent_content(pos, content)
+        # cells missing from the sparse belief store are unknown (no flags)
+        for pos in map_state:
+            self._draw_cell_agent_content(pos, agent_state.get(pos, 0))
 
         # Draw agent
         self._draw_agent(agent_position, agent_direction)
 
         # Draw percepts and goal
+        self._draw_texts(percepts, goal, score)
+
+        #
+        if not self.offscreen:
+            pygame.display.flip()  # Update the full display Surface to the screen
+
+    def _draw_texts(self, percepts: str, goal: str, score: int):
         self._draw_text_area("Score:", str(score), 0)
         if goal == 'look' or goal == 'go back':
             self._draw_text_area("Percepts:", percepts,  self.FONT_SIZE_TEXT + 10)
@@ -181,9 +222,71 @@ class WumpusWorldRenderer:
         else:
             self._draw_text_area("GAME OVER!   ", goal, 3 * (self.FONT_SIZE_TEXT + 10)) if goal else None
 
+    def _render_retained(self, map_state: dict[vec2D, str], agent_position: vec2D, agent_direction: str,
+                         percepts: str, goal: str, agent_state: dict[vec2D, int], score: int):
+        # Redraws only what changed since the last frame, see render_frame for the arguments.
+        if self._background is None:
+            self._background = pygame.Surface((self.SCREEN_WIDTH, self.SCREEN_HEIGHT))
+            self._background.fill(self.WHITE)
+            self._draw_grid(self._background)
+            self.screen.blit(self._background, (0, 0))
+            self._drawn_cells = {}
+            self._drawn_agent = None
+            self._drawn_text = None
+
+        dirty = set()
+        for pos, content in map_state.items():
+            drawn = (content, pos in agent_state, agent_state.get(pos, 0))
+            if self._drawn_cells.get(pos) != drawn:
+                self._drawn_cells[pos] = drawn
+                dirty.add(pos)
+
+        # the agent's old and new cells
+        agent = (agent_position, agent_direction)
+        if agent != self._drawn_agent:
+            if self._drawn_agent is not None:
+                dirty.add(self._drawn_agent[0])
+            dirty.add(agent_position)
+            self._drawn_agent = agent
+
+        rects = []
+        for pos in dirty:
+            # the background restores the cell and its grid lines
+            rect = self._get_cell_rect(pos.x, pos.y)
+            self.screen.blit(self._background, rect, rect)
+            content = self._drawn_cells[pos][0]
+            self._draw_cell_content(pos, content)
+            self._draw_cell_agent_content(pos, agent_state.get(pos, 0))
+            if pos == agent_position:
+                self._draw_agent(agent_position, agent_direction)
+            rects.append(rect)
+
+        text = (score, percepts, goal)
+        if text != self._drawn_text:
+            text_top = self.MARGIN + self.GRID_HEIGHT + self.MARGIN
+            rect = pygame.Rect(0, text_top, self.SCREEN_WIDTH, self.SCREEN_HEIGHT - text_top)
+            self.screen.blit(self._background, rect, rect)
+            self._draw_texts(percepts, goal, score)
+            self._drawn_text = text
+            rects.append(rect)
+
+        if rects and not self.offscreen:
+            pygame.display.update(rects)
+
+    def get_frame(self, copy: bool = False):
+        """
+        Returns the last rendered frame as a (height, width, 3) uint8 NumPy array.
 
-        #
-        pygame.display.flip()  # Update the full display Surface to the screen
+        Without copy, the array is a view of the surface's pixels. It locks the surface,
+        so it has to be released (del) before the next render_frame call.
+
+        Args:
+            copy (bool): Return an independent copy instead of a view.
+        """
+        if copy:
+            return pygame.surfarray.array3d(self.screen).transpose(1, 0, 2)
+        return pygame.surfarray.pixels3d(self.screen).transpose(1, 0, 2)
 
     def quit(self):
-        pygame.quit()
\ No newline at end of file
+        pygame.quit()
+
@@ -0,0 +1,368 @@
+import copy
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from grid_map import GridMap
+from inference import FrontierInference
+from map import directions, percept_bits, GLITTER
+from map_generator import CELL, START, WUMPUS, PIT, GOLD
+from planner import paths_to
+from state_machine import StateMachine, NO_PIT, NO_WUMPUS, PIT as PIT_FLAG, WUMPUS as WUMPUS_FLAG, VISITED
+
+# Monte Carlo tree search over the agent's belief state.
+#
+# Every iteration samples a world that agrees with everything the agent has seen
+# (determinization) and plays it on the agent itself: the knowledge base is updated
+# with the simulated percepts and rolled back afterwards with snapshot/restore. Tree
+# nodes live in a transposition table keyed by a Zobrist hash of the position, the
+# orientation and the belief flags of every cell, kept up to date as flags change,
+# so the same belief reached along different paths is expanded once.
+
+_MASK = (1 << 64) - 1
+
+
+def _zobrist(x, y, k):
+    # A fixed pseudo random 64 bit key per (x, y, k) (splitmix64 of the arguments),
+    # so the keys of huge maps don't need a table. Unknown cells (k = 0) hash to 0.
+    if k == 0:
+        return 0
+    z = (x * 0x9E3779B97F4A7C15 + y * 0xC2B2AE3D27D4EB4F + k * 0x165667B19E3779F9) & _MASK
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK
+    return z ^ (z >> 31)
+
+
+class _Node:
+    __slots__ = ('visits', 'stats', 'paths')
+
+    def __init__(self, paths):
+        self.visits = 0
+        self.paths = paths  # target cell -> actions of the path there
+        self.stats = {t: [0, 0.0] for t in paths}  # target cell -> [visits, total return]
+
+
+class SearchAgent(StateMachine):
+    """
+    A StateMachine whose get_action searches instead of following a fixed policy.
+
+    The moves of the search are walks along the shortest safe path to a cell the
+    agent hasn't visited: one of the nearest cells known to be safe or, when there
+    are none, one of the frontier cells least likely to kill. Every move visits a
+    new cell, so the tree has no cycles, and visiting the same cells in a different
+    order reaches the same node through the transposition table.
+
+    Grabbing the gold, the way home and shooting a located wumpus are left to the
+    StateMachine, so the search is only run while looking for the gold.
+    """
+
+    _SCALARS = StateMachine._SCALARS + ('belief_hash',)
+
+    def __init__(self, NX, NY, map, time_budget=0.05, iterations=None, depth=4, rollout=100,
+                 exploration=500.0, candidates=4, workers=1, seed=None, max_nodes=200000,
+                 mode='probabilistic', **kwargs):
+        """
+        Args:
+            time_budget (float): Seconds of search per decision.
+            iterations (int): Optional limit on the iterations per decision (per worker), e.g.
+                for reproducible runs. The search stops at whichever limit comes first.
+            depth (int): Moves of an iteration in the tree. Rollouts with the StateMachine
+                policy continue below it.
+            rollout (int): Turns of a rollout below the tree.
+            exploration (float): UCB exploration constant, in score points.
+            candidates (int): Target cells considered in every node.
+            workers (int): Processes searching the root in parallel, their root statistics are summed.
+                They are started by the first search and shut down by close().
+            seed: Seed of the search.
+            max_nodes (int): The transposition table is cleared when it grows past this.
+            mode (str): StateMachine mode of the rollouts.
+            kwargs: Other StateMachine arguments.
+        """
+        self.belief_hash = 0  # Zobrist hash of the belief flags, maintained by _set_flags
+        super().__init__(NX, NY, map, mode=mode, **kwargs)
+
+        self.time_budget = time_budget
+        self.iterations = iterations
+        self.depth = depth
+        self.rollout = rollout
+        self.exploration = exploration
+        self.candidates = candidates
+        self.workers = workers
+        self.max_nodes = max_nodes
+        self.search_rng = random.Random(seed)
+        self.table = {}  # state key -> _Node
+        self.plan = []  # the rest of the path of the chosen move
+        self.plan_hash = None  # belief_hash the plan was made with
+        self._pool = None
+
+    def _set_flags(self, pos, flags):
+        old = self.state.get(pos, 0)
+        if not super()._set_flags(pos, flags):
+            return False
+        self.belief_hash ^= _zobrist(pos.x, pos.y, old) ^ _zobrist(pos.x, pos.y, flags)
+        return True
+
+    def state_key(self):
+        """
+        Returns:
+            int: Zobrist hash of everything the future of the game depends on.
+        """
+        pos = self.position
+        status = (directions.index(self.orientation) | self.has_arrow << 2 | self.heard_scream << 3
+                  | (self.goal == 'go back') << 4)
+        return self.belief_hash ^ _zobrist(pos.x, pos.y, 256 + status)
+
+    def get_action(self, percepts):
+        # the searches of earlier turns are rolled back, the journal only holds real moves now
+        self.drop_snapshots()
+
+        if self.goal != 'look' or percept_bits(percepts) & GLITTER or self._can_shoot():
+            self.plan = []
+            return super().get_action(percepts)
+
+        # The chosen path is followed until something new is learned on the way.
+        if not self.plan or self.plan_hash != self.belief_hash:
+            stats = self.search()
+            paths = self._moves()
+            stats = {t: s for t, s in stats.items() if t in paths}
+            if not stats:
+                self.plan = []
+                return super().get_action(percepts)
+            target = max(stats, key=lambda t: (stats[t][0], stats[t][1]))
+            self.plan = list(paths[target])
+            self.plan_hash = self.belief_hash
+        return self.plan.pop(0)
+
+    def _can_shoot(self):
+        # the StateMachine turns to a located wumpus in line with the agent and shoots it
+        if not self.found_wumpa or self.heard_scream or not self.has_arrow:
+            return False
+        diff = self.wumpa_loc - self.position
+        return diff.x == 0 or diff.y == 0
+
+    def search(self):
+        """
+        Runs the search from the current state.
+        Returns:
+            dict: target cell -> [visits, total return] at the root.
+        """
+        if self.workers > 1:
+            return self._search_parallel()
+        if len(self.table) > self.max_nodes:
+            self.table.clear()
+        return _run_search(self, self.search_rng)
+
+    def _search_parallel(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        agent = self._detached()
+        jobs = [(agent, self.search_rng.getrandbits(64)) for _ in range(self.workers)]
+        merged = {}
+        for stats in self._pool.map(_search_job, jobs):
+            for target, (n, total) in stats.items():
+                entry = merged.setdefault(target, [0, 0.0])
+                entry[0] += n
+                entry[1] += total
+        return merged
+
+    def _detached(self):
+        # a copy with plain containers and no table, cheap to pickle for the workers
+        agent = copy.copy(self)
+        agent.state = dict(self.state)
+        agent.percepts_at = dict(self.percepts_at)
+        agent.possible_wumpi = set(self.possible_wumpi)
+        agent.frontier = set(self.frontier)
+        agent.unvisited_safe = set(self.unvisited_safe)
+        agent.planner = copy.copy(self.planner)
+        agent.planner.passable = set(self.planner.passable)
+        agent.planner.distance = dict(self.planner.distance)
+        agent.inference = FrontierInference(self.inference.pit_prior, self.inference.wumpus_prior,
+                                            self.inference.max_component)
+        agent.journal = None
+        agent.metrics = None
+        agent.table = {}
+        agent.plan = []
+        agent._pool = None
+        agent.workers = 1
+        return agent
+
+    def check_terminal(self, percepts):
+        over = super().check_terminal(percepts)
+        if over:
+            self.close()  # the episode is over, the workers aren't needed anymore
+        return over
+
+    def close(self):
+        """
+        Shuts the worker processes down. Done when the episode ends, and by leaving a
+        with block; the next search starts new ones.
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _moves(self):
+        # paths to the candidate target cells, see the class docstring
+        if self.unvisited_safe:
+            targets = self.unvisited_safe
+        elif self.frontier:
+            risk = self.frontier_risk()
+            targets = set(sorted(risk, key=risk.get)[:self.candidates])
+        else:
+            return {}
+        return paths_to(self.position, self.orientation, self.planner.passable, targets, self.candidates)
+
+    def _play_path(self, world, path):
+        # walks a path in a sampled world, learning from every cell on the way
+        for action in path:
+            self.apply_action(world, action)
+            if action != 'forward':
+                continue
+            bits = world.get_percept_bits(self.position)
+            if self.check_terminal(bits):
+                return
+            self.update_state(bits)
+            if bits & GLITTER:
+                self.apply_action(world, 'grab')
+                return
+
+    def _world_sampler(self):
+        # Per cell probabilities of a pit and a wumpus under the current belief, and the
+        # constraints every sample has to satisfy. Returns a function drawing GridMaps.
+        NX, NY = self.NX, self.NY
+        inference = self.inference
+        pit_constraints, wumpus_constraints = self._hazard_constraints()
+        pits = inference.probabilities(pit_constraints, inference.pit_prior)
+        wumpi = inference.probabilities(wumpus_constraints, inference.wumpus_prior)
+
+        p_pit = np.full((NX, NY), inference.pit_prior)
+        p_wumpus = np.full((NX, NY), inference.wumpus_prior)
+        visited = np.zeros((NX, NY), dtype=bool)
+        for c, flags in self.state.items():
+            p_pit[c.x, c.y] = 1.0 if flags & PIT_FLAG else 0.0 if flags & NO_PIT else pits.get(c, inference.pit_prior)
+            p_wumpus[c.x, c.y] = 1.0 if flags & WUMPUS_FLAG else 0.0 if flags & NO_WUMPUS else wumpi.get(c, inference.wumpus_prior)
+            visited[c.x, c.y] = bool(flags & VISITED)
+        start = self.start_position
+        p_pit[start.x, start.y] = p_wumpus[start.x, start.y] = 0.0
+
+        def flat(constraints):
+            # constraint id and flat cell index of every cell of every constraint
+            ids = [i for i, cells in enumerate(constraints) for _ in cells]
+            cells = [c.x * NY + c.y for constraint in constraints for c in constraint]
+            return len(constraints), np.array(ids, dtype=np.int64), np.array(cells, dtype=np.int64)
+
+        constraints = (flat(pit_constraints), flat(wumpus_constraints))
+
+        def sample(rng, tries=20):
+            for _ in range(tries):
+                pit = rng.random((NX, NY)) < p_pit
+                wumpus = ~pit & (rng.random((NX, NY)) < p_wumpus)
+                ok = True
+                for (n, ids, cells), hazard in zip(constraints, (pit, wumpus)):
+                    if n and np.bincount(ids, weights=hazard.ravel()[cells], minlength=n).min() == 0:
+                        ok = False
+                        break
+                if ok:
+                    break
+
+            grid = np.full((NX, NY), CELL, dtype=np.uint8)
+            grid[pit] = PIT
+            grid[wumpus] = WUMPUS
+            grid[start.x, start.y] = START
+            free = np.flatnonzero((grid == CELL) & ~visited)
+            if len(free):
+                grid.flat[free[rng.integers(len(free))]] = GOLD
+            return GridMap(NX, NY, 0, 0, grid=grid)
+
+        return sample
+
+    def _evaluate(self):
+        # estimated rest of the score of the current state
+        if self.goal == 'go back':
+            d = self.planner.distance_to_goal(self.position, self.orientation)
+            return 1000 - (d if d is not None else 2 * (self.NX + self.NY))
+        return 0.0
+
+
+def _run_search(agent, rng):
+    # MCTS from the agent's current state, see SearchAgent. Returns the root statistics.
+    np_rng = np.random.default_rng(rng.getrandbits(64))
+    sample = agent._world_sampler()
+    table = agent.table
+    root_key = agent.state_key()
+    deadline = time.perf_counter() + agent.time_budget
+    iterations = 0
+
+    while time.perf_counter() < deadline and (agent.iterations is None or iterations < agent.iterations):
+        iterations += 1
+        world = sample(np_rng)
+        world_snapshot = world.snapshot()
+        snapshot = agent.snapshot()
+        path = []  # (node, target, score before the move)
+
+        for _ in range(agent.depth):
+            if agent.goal != 'look':
+                break
+            key = agent.state_key()
+            node = table.get(key)
+            expanded = node is None
+            if expanded:
+                node = table[key] = _Node(agent._moves())
+            if not node.stats:
+                break
+            target = _select(node, agent.exploration, rng)
+            path.append((node, target, agent.score))
+            agent._play_path(world, node.paths[target])
+            if expanded:
+                break
+
+        # rollout with the StateMachine policy below the tree
+        for _ in range(agent.rollout):
+            if agent.goal != 'look' and agent.goal != 'go back':
+                break
+            bits = world.get_percept_bits(agent.position)
+            if agent.goal == 'look':
+                agent.update_state(bits)
+            if agent.goal == 'go back' and not bits & GLITTER:
+                break  # _evaluate covers the way back
+            agent.apply_action(world, StateMachine.get_action(agent, bits))
+            agent.check_terminal(world.get_percept_bits(agent.position))
+
+        final = agent.score + agent._evaluate()
+        for node, target, score in path:
+            node.visits += 1
+            entry = node.stats[target]
+            entry[0] += 1
+            entry[1] += final - score
+
+        agent.restore(snapshot)
+        world.restore(world_snapshot)
+
+    root = table.get(root_key)
+    if root is None:
+        return {}
+    return {t: list(s) for t, s in root.stats.items()}
+
+
+def _select(node, exploration, rng):
+    # UCB1, untried actions first
+    untried = [a for a, (n, _) in node.stats.items() if n == 0]
+    if untried:
+        return rng.choice(untried)
+    log_n = math.log(node.visits)
+    return max(node.stats, key=lambda a: node.stats[a][1] / node.stats[a][0]
+               + exploration * math.sqrt(log_n / node.stats[a][0]))
+
+
+def _search_job(args):
+    agent, seed = args
+    return _run_search(agent, random.Random(seed))
@@ -0,0 +1,279 @@
+import argparse
+import asyncio
+import itertools
+import json
+
+from map import Map
+from state_machine import StateMachine, actions, modes, agent_seed
+
+# Asyncio server hosting many Wumpus World sessions at once, for agents running in
+# other processes and languages.
+#
+#   python server.py --port 8765
+#
+# The protocol is newline-delimited JSON over TCP: every line is one request, and
+# every request gets one response line carrying the same "id". Requests are handled
+# in the order they arrive on a connection, so a client can pipeline as many as it
+# likes without waiting for the responses.
+#
+#   {"id": 1, "op": "reset", "Nx": 4, "Ny": 4, "nWumpus": 1, "nPits": 2, "seed": 7}
+#   {"id": 1, "session": 1, "obs": {"percepts": "", "position": [0, 2], ...}}
+#   {"id": 2, "op": "step", "session": 1, "action": "forward"}
+#   {"id": 2, "session": 1, "obs": {...}, "reward": -1, "done": false, "truncated": false}
+#   {"id": 3, "op": "step_batch", "steps": [{"session": 1, "action": "left"}, {"session": 2}]}
+#   {"id": 3, "results": [{"session": 1, "obs": ...}, {"session": 2, "obs": ...}]}
+#
+# Operations:
+#   reset       Starts a session, or restarts the one given by "session". Optional "agent"
+#               ('random' or 'probabilistic') adds a built-in StateMachine that picks the
+#               action of every step without one. Optional "max_turns" truncates the episode.
+#   step        Applies "action" (see state_machine.actions) to a session.
+#   step_batch  Applies a list of steps, results in the same order. A failing step only
+#               fails its own entry.
+#   observe     Returns the current observation of a session.
+#   close       Ends a session.
+#
+# Errors are returned as {"id": ..., "error": "..."}. A failing request never closes
+# the connection, the requests pipelined after it are still answered.
+
+# longest request line, batched steps can be long
+MAX_LINE = 16 * 1024 * 1024
+
+# default limit on the cells of a session's map. Maps are built on the event loop,
+# a huge one would stall every other session
+MAX_CELLS = 64 * 64
+
+
+class Session:
+    """
+    One game: a Map and the StateMachine that holds the agent's position, orientation,
+    score and goal. Scoring follows compute_turn.
+    """
+
+    def __init__(self, Nx, Ny, nWumpus, nPits, seed=None, agent=None, max_turns=None):
+        """
+        Args:
+            agent (str): Mode of a built-in agent, or None if the client picks every action.
+            max_turns (int): Optional turn limit.
+        """
+        if agent is not None and agent not in modes:
+            raise ValueError(f"unknown agent '{agent}'")
+        self.map = Map(Nx, Ny, nWumpus, nPits, seed)
+        self.agent = StateMachine(Nx, Ny, self.map, agent or 'random', rng=agent_seed(seed))
+        self.builtin = agent is not None
+        self.max_turns = max_turns
+        self.percepts = self.map.get_percepts(self.agent.position)
+        self.done = False
+
+    def observe(self):
+        agent = self.agent
+        return {
+            'percepts': self.percepts,
+            'position': [agent.position.x, agent.position.y],
+            'orientation': agent.orientation,
+            'goal': agent.goal,
+            'score': agent.score,
+            'turn': agent.n,
+        }
+
+    def truncated(self):
+        return not self.done and self.max_turns is not None and self.agent.n >= self.max_turns
+
+    def step(self, action=None):
+        """
+        Returns:
+            tuple: (observation, reward, done, truncated)
+        """
+        if self.done or self.truncated():
+            raise ValueError("the episode is over, reset the session")
+
+        agent = self.agent
+        if action is None:
+            if not self.builtin:
+                raise ValueError("no action given and the session has no built-in agent")
+            if agent.goal == 'look':
+                agent.update_state(self.percepts)
+            action = agent.get_action(self.percepts)
+        elif action not in actions:
+            raise ValueError(f"unknown action '{action}'")
+
+        score = agent.score
+        agent.apply_action(self.map, action)
+        self.percepts = self.map.get_percepts(agent.position)
+        # the terminal checks compute_turn runs at the start of the next turn
+        self.done = agent.check_terminal(self.percepts)
+        return self.observe(), agent.score - score, self.done, self.truncated()
+
+
+class WumpusServer:
+    """
+    The sessions of the server and the dispatch of requests. handle() can be used
+    directly, without the network, e.g. to embed the sessions in another event loop.
+    """
+
+    def __init__(self, max_sessions=None, max_cells=MAX_CELLS):
+        """
+        Args:
+            max_sessions (int): Optional limit on the number of open sessions.
+            max_cells (int): Limit on Nx * Ny of a session's map, None for no limit.
+        """
+        self.sessions = {}
+        self.max_sessions = max_sessions
+        self.max_cells = max_cells
+        self._ids = itertools.count(1)
+
+    def _session(self, request):
+        session = self.sessions.get(request.get('session'))
+        if session is None:
+            raise KeyError(f"no session {request.get('session')}")
+        return session
+
+    def _reset(self, request):
+        session_id = request.get('session')
+        if session_id is not None and session_id not in self.sessions:
+            raise KeyError(f"no session {session_id}")
+        if session_id is None:
+            if self.max_sessions is not None and len(self.sessions) >= self.max_sessions:
+                raise ValueError(f"too many sessions ({self.max_sessions})")
+        for field, low in (('Nx', 1), ('Ny', 1), ('nWumpus', 0), ('nPits', 0)):
+            if field not in request:
+                raise ValueError(f"missing '{field}'")
+            _check_int(field, request[field], low)
+        if self.max_cells is not None and request['Nx'] * request['Ny'] > self.max_cells:
+            raise ValueError(f"maps are limited to {self.max_cells} cells")
+        if request.get('seed') is not None:
+            _check_int('seed', request['seed'], 0)
+        if request.get('max_turns') is not None:
+            _check_int('max_turns', request['max_turns'], 0)
+
+        session = Session(request['Nx'], request['Ny'], request['nWumpus'], request['nPits'],
+                          request.get('seed'), request.get('agent'), request.get('max_turns'))
+        if session_id is None:
+            session_id = next(self._ids)
+        self.sessions[session_id] = session
+        return {'session': session_id, 'obs': session.observe()}
+
+    def _step(self, request):
+        obs, reward, done, truncated = self._session(request).step(request.get('action'))
+        return {'session': request.get('session'), 'obs': obs, 'reward': reward, 'done': done, 'truncated': truncated}
+
+    def _step_batch(self, request):
+        if not isinstance(request.get('steps'), list):
+            raise ValueError("'steps' must be a list")
+        results = []
+        for step in request['steps']:
+            if not isinstance(step, dict):
+                results.append({'session': None, 'error': "steps must be JSON objects"})
+                continue
+            try:
+                results.append(self._step(step))
+            except Exception as e:
+                results.append({'session': step.get('session'), 'error': _message(e)})
+        return {'results': results}
+
+    def _observe(self, request):
+        session = self._session(request)
+        return {'session': request['session'], 'obs': session.observe(), 'done': session.done,
+                'truncated': session.truncated()}
+
+    def _close(self, request):
+        self._session(request)
+        del self.sessions[request['session']]
+        return {'session': request['session']}
+
+    def handle(self, request):
+        """
+        Args:
+            request (dict): A decoded request.
+        Returns:
+            dict: The response, carrying the request's id.
+        """
+        try:
+            op = request.get('op')
+            # ops are looked up in a dict, anything but a string (e.g. a list) can't be a key
+            handler = self._handlers.get(op) if isinstance(op, str) else None
+            if handler is None:
+                raise ValueError(f"unknown op {json.dumps(op)}")
+            response = handler(self, request)
+        except Exception as e:
+            response = {'error': _message(e)}
+        response['id'] = request.get('id')
+        return response
+
+    _handlers = {
+        'reset': _reset,
+        'step': _step,
+        'step_batch': _step_batch,
+        'observe': _observe,
+        'close': _close,
+    }
+
+    async def _serve_client(self, reader, writer):
+        # Answers the requests of one connection in order. Responses are written as soon
+        # as they are ready, drain only waits when the client doesn't keep up reading.
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("requests must be JSON objects")
+                except (ValueError, RecursionError) as e:
+                    # RecursionError: JSON nested deeper than the decoder's recursion limit
+                    response = {'id': None, 'error': f"bad request: {e}"}
+                else:
+                    response = self.handle(request)
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.LimitOverrunError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8765):
+        """
+        Returns:
+            asyncio.Server: The listening server, see asyncio.start_server.
+        """
+        return await asyncio.start_server(self._serve_client, host, port, limit=MAX_LINE)
+
+
+def _check_int(field, value, low):
+    # JSON numbers can be floats and true is a number in Python, only plain integers are accepted
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"'{field}' must be an integer")
+    if value < low:
+        raise ValueError(f"'{field}' must be at least {low}")
+
+
+def _message(e):
+    # KeyError wraps its message in quotes
+    if isinstance(e, KeyError) and e.args:
+        return e.args[0]
+    if isinstance(e, (ValueError, TypeError)):
+        return str(e)
+    # anything else is a bug, name it rather than dropping the connection
+    return f"internal error: {type(e).__name__}: {e}"
+
+
+async def _main(host, port, max_sessions, max_cells):
+    server = await WumpusServer(max_sessions, max_cells).start(host, port)
+    print(f"serving on {', '.join(str(s.getsockname()) for s in server.sockets)}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve Wumpus World sessions over newline-delimited JSON.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--max-sessions', type=int)
+    parser.add_argument('--max-cells', type=int, default=MAX_CELLS, help="limit on Nx * Ny of a map")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(_main(args.host, args.port, args.max_sessions, args.max_cells))
+    except KeyboardInterrupt:
+        pass
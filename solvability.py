@@ -0,0 +1,85 @@
+import numpy as np
+
+from map_generator import START, WUMPUS, PIT, GOLD
+
+# Bulk solvability analysis of map layouts.
+#
+# A layout is solvable if a path of hazard free cells leads from the start to the
+# gold. The paths of many layouts are found at once with a flood fill over the whole
+# (count, NX, NY) stack: every step grows the set of reached cells of every layout by
+# one cell in each direction, so a stack of layouts takes as many numpy operations as
+# its longest shortest path, however many layouts it holds.
+#
+# Wumpi count as hazards, the analysis doesn't assume the arrow is spent on them.
+
+# analysis of one layout, see analyze
+ANALYSIS_DTYPE = np.dtype([('solvable', '?'), ('length', '<i4'), ('difficulty', '<f4')])
+
+
+def _spread(reached):
+    # the cells next to a reached cell, (count, NX, NY) bool
+    grown = reached.copy()
+    grown[:, 1:, :] |= reached[:, :-1, :]
+    grown[:, :-1, :] |= reached[:, 1:, :]
+    grown[:, :, 1:] |= reached[:, :, :-1]
+    grown[:, :, :-1] |= reached[:, :, 1:]
+    return grown
+
+
+def analyze(layouts):
+    """
+    Analyzes a stack of layouts.
+
+    The difficulty is a heuristic for ordering maps: the length of the shortest safe
+    path relative to the map size, plus the fraction of the cells within that many
+    steps of the start where a breeze or a stench forces the agent to guess. Maps
+    without a safe path have an infinite difficulty.
+
+    Args:
+        layouts (np.ndarray): (count, NX, NY) or (NX, NY) uint8 layouts, see map_generator.
+    Returns:
+        np.ndarray: (count,) array of ANALYSIS_DTYPE, or a single record for a single layout:
+            solvable, length (moves on the shortest safe path, -1 if there is none) and difficulty.
+    """
+    layouts = np.asarray(layouts)
+    single = layouts.ndim == 2
+    if single:
+        layouts = layouts[None]
+    count, NX, NY = layouts.shape
+
+    hazard = (layouts == WUMPUS) | (layouts == PIT)
+    safe = ~hazard
+    warned = _spread(hazard) & safe  # safe cells with a breeze or a stench
+    gold = layouts == GOLD
+
+    # flood fill from the start, distance of every reached cell
+    reached = layouts == START
+    distance = np.where(reached, 0, -1).astype(np.int32)
+    steps = 0
+    while True:
+        new = _spread(reached) & safe & ~reached
+        if not new.any():
+            break
+        steps += 1
+        distance[new] = steps
+        reached |= new
+
+    result = np.zeros(count, dtype=ANALYSIS_DTYPE)
+    length = np.where(gold, distance, -1).reshape(count, -1).max(axis=1)
+    solvable = length >= 0
+    result['solvable'] = solvable
+    result['length'] = length
+
+    near = (distance >= 0) & (distance <= length[:, None, None])
+    guesses = (near & warned).reshape(count, -1).sum(axis=1) / np.maximum(near.reshape(count, -1).sum(axis=1), 1)
+    result['difficulty'] = np.where(solvable, length / (NX + NY - 2) + guesses, np.inf)
+
+    return result[0] if single else result
+
+
+def solvable(layouts):
+    """
+    Returns:
+        np.ndarray: (count,) bool, True for the layouts with a safe path from the start to the gold.
+    """
+    return analyze(layouts)['solvable']
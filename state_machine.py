@@ -1,107 +1,293 @@
+import numpy as np
+
 from vec2D import vec2D
-from map import Map
-from random import randint
+from map import Map, directions, percept_bits, STENCH, BREEZE, GLITTER, DEADLY
+from planner import SafePathPlanner, first_action
+from inference import FrontierInference
+from journal import Journal, JournaledDict, JournaledSet
+from time import perf_counter
+
+actions = ['forward', 'left', 'right', 'shoot', 'grab'] # index is the action code
+goals = ['look', 'go back', 'agent won', 'agent died'] # index is the goal code
+
+# belief flags of a cell, combined bitwise. A cell without flags is unknown
+SAFE = 1               # no pit and no wumpus
+NO_PIT = 2             # ruled out by a neighbour without breeze
+NO_WUMPUS = 4          # ruled out by a neighbour without stench
+POSSIBLE_PIT = 8       # next to a breeze and not ruled out
+POSSIBLE_WUMPUS = 16   # next to a stench and not ruled out
+PIT = 32               # the only possible pit next to a breeze
+WUMPUS = 64            # the only possible wumpus next to a stench
+VISITED = 128
+
+# percept bits kept per visited cell
+_STENCH = 1
+_BREEZE = 2
+_STALE_STENCH = 4  # stench seen before a scream, tells nothing about the remaining wumpi
+
+# decision modes of get_action
+modes = ['random', 'probabilistic']
+
+# The random walk's rolls (0-100, both included) are drawn from the agent's generator
+# this many at a time, instead of one Python call per roll.
+ROLL_BLOCK = 256
+
+# spawn key of the agent's stream of an episode, see agent_seed
+_AGENT_STREAM = 1
+
+
+def agent_seed(seed):
+    """
+    The seed of the agent of an episode whose map is seeded with seed. The agent's
+    stream is independent of the map's, and both follow from the one episode seed.
+    Args:
+        seed: Seed, SeedSequence or np.random.Generator of the episode.
+    Returns:
+        np.random.SeedSequence or np.random.Generator: The seed to pass as the agent's rng.
+    """
+    if isinstance(seed, np.random.Generator):
+        return seed.spawn(1)[0]
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return np.random.SeedSequence(seed.entropy, spawn_key=seed.spawn_key + (_AGENT_STREAM,))
 
-directions = ['east', 'south', 'west', 'north'] # clockwise order
 
 class StateMachine:
-    def __init__(self, NX, NY, map : Map):
+    state: dict[vec2D, int]
+
+    def __init__(self, NX, NY, map : Map, mode='random', inference=None, metrics=None,
+                 safe_forward=60, risky_forward=80, rng=None):
+        """
+        Args:
+            NX (int): Width of the map.
+            NY (int): Height of the map.
+            map (Map): The map the agent plays on.
+            mode (str): 'random' walks randomly with fixed forward chances, 'probabilistic'
+                explores the safest frontier cell first (see FrontierInference).
+            inference (FrontierInference): Inference engine for the 'probabilistic' mode.
+                Agents can share one to share its memo.
+            metrics (TurnMetrics): Optional instrumentation of compute_turn (see metrics.py).
+            safe_forward (int): The random walk steps onto a safe square when a roll of 0-100 is below this.
+            risky_forward (int): The random walk steps onto a square that isn't known to be safe
+                when the roll is above this, while looking for the gold.
+            rng: Seed, SeedSequence or np.random.Generator of the agent's random decisions.
+                Use agent_seed to derive it from the seed of an episode.
+        """
+        if mode not in modes:
+            raise ValueError(f"unknown mode '{mode}'")
+        self.mode = mode
+        self.inference = inference if inference is not None else FrontierInference()
+        self.metrics = metrics
+        self.safe_forward = safe_forward
+        self.risky_forward = risky_forward
+        self.rng = np.random.default_rng(rng)
+        self._rolls = []  # pre-drawn rolls, see _roll
+        self._next_roll = 0
+
         self.n = 0
+        # belief flags of the cells the agent knows anything about. Cells missing
+        # from the dict are unknown, so memory grows with the explored area only
         self.state = {}
 
-        for x in range(0, NX):
-            for y in range(0, NY):
-                self.state[vec2D(x, y)] = 'unknown'
+        # knowledge base bookkeeping, maintained by _set_flags
+        self.n_unknown = NX * NY         # cells without any flags
+        self.possible_wumpi = set()      # cells that may hold a wumpus
+        self.frontier = set()            # cells next to a visited cell that are not known to be safe
+        self.unvisited_safe = set()      # cells known to be safe but not visited yet
+        self.percepts_at = {}            # percept bits of every visited cell
 
         self.NX = NX
         self.NY = NY
         self.orientation = 'east'  # initial orientation
         self.start_position = map.get_start()  # starting position
         self.position = self.start_position
-        self.state[self.start_position] = 'safe'  # starting position is safe
+        self.planner = SafePathPlanner(self.start_position)  # shortest safe paths back to the start
+        self._mark_safe(self.start_position)  # starting position is safe
         self.goal = 'look'
         self.heard_scream = False
+        self.has_arrow = True
         self.wumpa_loc = None
         self.found_wumpa = False
 
         self.score = 0  # score for the agent, starts at 0
-
-    def update_state(self, percepts : str):
-        x = self.position.x
-        y = self.position.y
-
-        n = vec2D(x, y + 1)
-        s = vec2D(x, y - 1)
-        e = vec2D(x + 1, y)
-        w = vec2D(x - 1, y)
-
-        if 'stench' in percepts:
-            # mark the adjacent squares as unsafe if and only if they're not marked as safe
-            if self.state.get(n, '') == 'unknown' and n in self.state:
-                self.state[n] = 'pw'
-            if self.state.get(s, '') == 'unknown' and s in self.state:
-                self.state[s] = 'pw'
-            if self.state.get(e, '') == 'unknown' and e in self.state:
-                self.state[e] = 'pw'
-            if self.state.get(w, '') == 'unknown' and w in self.state:
-                self.state[w] = 'pw'
-        elif 'breeze' in percepts:
-            # mark the adjacent squares as unsafe if and only if they're not marked as safe
-            if self.state.get(n, '') == 'unknown' and n in self.state:
-                self.state[n] += 'pp'
-            if self.state.get(s, '') == 'unknown' and s in self.state:
-                self.state[s] += 'pp'
-            if self.state.get(e, '') == 'unknown' and e in self.state:
-                self.state[e] += 'pp'
-            if self.state.get(w, '') == 'unknown' and w in self.state:
-                self.state[w] += 'pp'
-        elif 'breeze' in percepts and 'stench' in percepts:
-            # mark the adjacent squares as unsafe if and only if they're not marked as safe
-            if self.state.get(n, '') == 'unknown' and n in self.state:
-                self.state[n] += 'pwp'
-            if self.state.get(s, '') == 'unknown' and s in self.state:
-                self.state[s] += 'pwp'
-            if self.state.get(e, '') == 'unknown' and e in self.state:
-                self.state[e] += 'pwp'
-            if self.state.get(w, '') == 'unknown' and w in self.state:
-                self.state[w] += 'pwp'
+        self.last_action = None  # action applied in the last turn, None for the turn that ended the game
+
+        self.journal = None  # undo log, started by the first snapshot
+
+    # attributes saved by snapshot, everything else is rolled back by the journal
+    _SCALARS = ('n', 'n_unknown', 'position', 'orientation', 'goal', 'heard_scream', 'has_arrow',
+                'wumpa_loc', 'found_wumpa', 'score', 'last_action')
+
+    def snapshot(self):
+        """
+        Returns a token that restore() rolls the agent back to.
+
+        The first snapshot switches the knowledge base to journaled containers (see
+        journal.py), after which every change is logged. Taking a snapshot then costs a
+        few attribute reads, and restoring costs the changes made since. The random
+        stream is saved too, so a restored agent makes the same decisions again. The map
+        has a snapshot of its own.
+        """
+        if self.journal is None:
+            journal = Journal()
+            self.state = JournaledDict(journal, self.state)
+            self.percepts_at = JournaledDict(journal, self.percepts_at)
+            self.possible_wumpi = JournaledSet(journal, self.possible_wumpi)
+            self.frontier = JournaledSet(journal, self.frontier)
+            self.unvisited_safe = JournaledSet(journal, self.unvisited_safe)
+            self.planner.start_journal(journal)
+            self.journal = journal
+        return ((self.journal.mark(),) + tuple(getattr(self, name) for name in self._SCALARS)
+                + (self._rolls.copy(), self._next_roll, self.rng.bit_generator.state))
+
+    def restore(self, snapshot):
+        """
+        Rolls the agent back to a snapshot. Snapshots taken after it become invalid.
+        """
+        self.journal.undo(snapshot[0])
+        for name, value in zip(self._SCALARS, snapshot[1:]):
+            setattr(self, name, value)
+        rolls, self._next_roll, self.rng.bit_generator.state = snapshot[-3:]
+        self._rolls = rolls.copy()
+
+    def drop_snapshots(self):
+        """
+        Empties the journal, e.g. after a real move, so it doesn't grow for the rest of the game.
+        """
+        if self.journal is not None:
+            self.journal.clear()
+
+    def _set_flags(self, pos, flags):
+        old = self.state.get(pos, 0)
+        if old == flags:
+            return False
+        self.state[pos] = flags
+
+        if old == 0:
+            self.n_unknown -= 1
+        elif flags == 0:
+            self.n_unknown += 1  # every flag dropped, e.g. by _forget_wumpi
+        if flags & POSSIBLE_WUMPUS:
+            self.possible_wumpi.add(pos)
         else:
-            # mark all adjacent squares as safe if they are not walls
-            if n in self.state:
-                self.state[n] = 'safe'
-            if s in self.state:
-                self.state[s] = 'safe'
-            if e in self.state:
-                self.state[e] = 'safe'
-            if w in self.state:
-                self.state[w] = 'safe'
-
-    def get_action(self, percepts : str):
-
-        if 'glitter' in percepts:
-            # if glitter is found, return 'grab'
-            return 'grab'
+            self.possible_wumpi.discard(pos)
+        if flags & SAFE and not old & SAFE:
+            self.frontier.discard(pos)
+            self.planner.add_cell(pos)
+        if flags & VISITED:
+            self.unvisited_safe.discard(pos)
+        elif flags & SAFE:
+            self.unvisited_safe.add(pos)
+        if flags & WUMPUS and not old & WUMPUS:
+            self.wumpa_loc = pos
+            self.found_wumpa = True
+        return True
+
+    def _mark_safe(self, pos):
+        flags = (self.state.get(pos, 0) | SAFE | NO_PIT | NO_WUMPUS) & ~(POSSIBLE_PIT | POSSIBLE_WUMPUS | PIT | WUMPUS)
+        return self._set_flags(pos, flags)
+
+    def _forget_wumpi(self):
+        # After a scream the stenches seen so far may be stale, so drop every conclusion
+        # drawn from them. Cells ruled out as wumpus stay ruled out.
+        for pos in list(self.possible_wumpi):
+            self._set_flags(pos, self.state[pos] & ~(POSSIBLE_WUMPUS | WUMPUS))
+        if self.wumpa_loc is not None:
+            self._set_flags(self.wumpa_loc, self.state[self.wumpa_loc] & ~WUMPUS)
+            self.wumpa_loc = None
+        for pos, bits in self.percepts_at.items():
+            if bits & _STENCH:
+                self.percepts_at[pos] = (bits & ~_STENCH) | _STALE_STENCH
+
+    def update_state(self, percepts):
+        """
+        Adds the percepts of the current position to the knowledge base.
+        percepts is a percept string or percept bits (see map.percept_bits).
+
+        Only the neighbourhood of the current position is updated. When a cell
+        changes, the constraints of the visited cells around it are re-checked,
+        so conclusions propagate without rescanning the whole map.
+        """
+        seen = percept_bits(percepts)
+        bits = 0
+        if seen & STENCH:
+            bits |= _STENCH
+        if seen & BREEZE:
+            bits |= _BREEZE
+
+        pos = self.position
+        self.percepts_at[pos] = bits
+        self._mark_safe(pos)
+        self._set_flags(pos, self.state[pos] | VISITED)
+
+        for c in self._neighbours(pos):
+            if not self.state.get(c, 0) & SAFE:
+                self.frontier.add(c)
+
+        # constraint propagation, starting at the current position
+        work = [pos]
+        while work:
+            v = work.pop()
+            for c in self._apply_percepts(v):
+                for u in c.neighbours():
+                    if u != v and u in self.percepts_at:
+                        work.append(u)
+
+    def _apply_percepts(self, v):
+        # Applies the percepts seen at visited cell v to its neighbours.
+        # Returns the neighbours whose flags changed.
+        bits = self.percepts_at[v]
+        neighbours = self._neighbours(v)
+        changed = []
+
+        for c in neighbours:
+            flags = self.state.get(c, 0)
+            if flags & SAFE:
+                continue
+
+            if bits & _STALE_STENCH:
+                pass
+            elif not bits & _STENCH:
+                flags = (flags | NO_WUMPUS) & ~POSSIBLE_WUMPUS
+            elif not flags & NO_WUMPUS:
+                flags |= POSSIBLE_WUMPUS
+
+            if not bits & _BREEZE:
+                flags = (flags | NO_PIT) & ~POSSIBLE_PIT
+            elif not flags & NO_PIT:
+                flags |= POSSIBLE_PIT
+
+            if flags & NO_PIT and flags & NO_WUMPUS:
+                flags = (flags | SAFE) & ~(PIT | WUMPUS)
+
+            if self._set_flags(c, flags):
+                changed.append(c)
+
+        # a stench (breeze) with a single possible cell around it locates the wumpus (pit)
+        for bit, possible, located in ((_STENCH, POSSIBLE_WUMPUS, WUMPUS), (_BREEZE, POSSIBLE_PIT, PIT)):
+            if bits & bit:
+                candidates = [c for c in neighbours if self.state.get(c, 0) & possible]
+                if len(candidates) == 1 and not self.state[candidates[0]] & located:
+                    self._set_flags(candidates[0], self.state[candidates[0]] | located)
+                    changed.append(candidates[0])
+
+        return changed
+
+    def _neighbours(self, pos):
+        # the neighbours of pos inside the map, in the order of vec2D.neighbours
+        NX = self.NX
+        NY = self.NY
+        return [c for c in pos.neighbours() if 0 <= c.x < NX and 0 <= c.y < NY]
+
+    def get_action(self, percepts):
+
+        action = self.forced_action(percepts)
+        if action is not None:
+            return action
 
         imm_sq = self.immediate_square(self.orientation)
 
-        has_unknown = False
-        possible_wumpa_count = 0
-
-        if not self.found_wumpa:
-            for pos, state in self.state.items():
-                if state == 'unknown':
-                    has_unknown = True
-                if state == 'pw' or state == 'pwp':
-                    possible_wumpa_count += 1
-
-        if not has_unknown and possible_wumpa_count == 1:
-            self.found_wumpa = True
-            for pos, state in self.state.items():
-                if state == 'pw' or state == 'pwp':
-                    self.wumpa_loc = pos
-                    self.state[pos] = 'w'
-
-        if self.found_wumpa and not self.heard_scream:
+        if self.found_wumpa and not self.heard_scream and self.has_arrow:
             # Shoot action
             # First lets face in the general direction of the wumpus
             diff = self.wumpa_loc - self.position
@@ -110,7 +296,7 @@ class StateMachine:
                 # turn until we face and shoot.
                 dir_to_wumpa = diff.normalized()
                 heading = self.immediate_square(self.orientation) - self.position
-                if vec2D.dot(dir_to_wumpa, heading) < 0:
+                if vec2D.dot(dir_to_wumpa, heading) <= 0:
                     # turn right until we face wumpus
                     return 'right'
                 else:
@@ -119,79 +305,222 @@ class StateMachine:
 
         # else shoot if found. But shooting is not a priority.
 
+        if self.mode == 'probabilistic':
+            action = self._explore_action()
+            if action is not None:
+                return action
+
         # Generate a single random number for the 'forward' movement checks
         # This number is used for both the 'safe' and 'unsafe' forward conditions,
         # ensuring their probabilities are mutually exclusive based on this single roll.
-        forward_chance_roll = randint(0, 100)
+        forward_chance_roll = self._roll()
 
         # Determine the known status of the immediate square
-        # Using .get() allows for gracefully handling cases where imm_sq might not be in self.state
-        imm_sq_status = self.state.get(imm_sq)
+        # None if imm_sq is outside the map, cells missing from self.state are unknown (0)
+        imm_sq_status = self.state.get(imm_sq, 0) if 0 <= imm_sq.x < self.NX and 0 <= imm_sq.y < self.NY else None
         imm_sq_is_known = imm_sq_status is not None
-        imm_sq_is_safe = imm_sq_status == 'safe'
-        imm_sq_is_wumpus = imm_sq_status == 'w'
-        imm_sq_is_not_wumpus = imm_sq_status != 'w'  # More explicit check
+        imm_sq_is_safe = imm_sq_is_known and imm_sq_status & SAFE
+        imm_sq_is_wumpus = imm_sq_is_known and imm_sq_status & WUMPUS
+        imm_sq_is_not_wumpus = not imm_sq_is_known or not imm_sq_status & (WUMPUS | PIT)  # located pits are avoided as well
 
-        # Condition 1: Prefer to move forward if the square is safe and within the probability threshold (60% chance)
-        if imm_sq_is_known and imm_sq_is_safe and forward_chance_roll < 60:
+        # Condition 1: Prefer to move forward if the square is safe and within the probability threshold (60% chance by default)
+        if imm_sq_is_known and imm_sq_is_safe and forward_chance_roll < self.safe_forward:
             return 'forward'
-        # Condition 2: If not safe, take a small chance to move forward if it's not a Wumpus and the goal is 'look' (20% chance, provided Condition 1 wasn't met)
-        elif imm_sq_is_known and not imm_sq_is_safe and imm_sq_is_not_wumpus and forward_chance_roll > 80 and self.goal == 'look':
+        # Condition 2: If not safe, take a small chance to move forward if it's not a Wumpus and the goal is 'look' (20% chance by default, provided Condition 1 wasn't met)
+        elif imm_sq_is_known and not imm_sq_is_safe and imm_sq_is_not_wumpus and forward_chance_roll > self.risky_forward and self.goal == 'look':
             return 'forward'
         # If neither of the above conditions for moving forward are met
         else:
             # Generate a new random number specifically for deciding the turn direction
-            turn_direction_roll = randint(0, 100)
+            turn_direction_roll = self._roll()
             if turn_direction_roll % 2 == 0:
                 return 'right'
             else:
                 return 'left'
 
+    def forced_action(self, percepts):
+        """
+        The start of get_action that doesn't depend on the mode: grabbing the gold and
+        following the way back. When neither applies, the knowledge base is updated the
+        way get_action does before it decides, see locate_last_wumpus.
+        percepts is a percept string or percept bits.
+        Returns:
+            str: The action, or None if get_action has to decide.
+        """
+        if percept_bits(percepts) & GLITTER:
+            # if glitter is found, return 'grab'
+            return 'grab'
+
+        if self.goal == 'go back':
+            # follow the shortest safe path back to the start
+            action = self.planner.next_action(self.position, self.orientation)
+            if action is not None:
+                return action
+
+        self.locate_last_wumpus()
+        return None
+
+    def locate_last_wumpus(self):
+        # with every cell explored, a single possible wumpus must be the wumpus
+        if not self.found_wumpa and self.n_unknown == 0 and len(self.possible_wumpi) == 1:
+            for pos in self.possible_wumpi:
+                self._set_flags(pos, self.state[pos] | WUMPUS)
+
+    def _roll(self):
+        # the next pre-drawn roll of 0-100, a new block is drawn when they run out
+        if self._next_roll == len(self._rolls):
+            self._rolls = self.rng.integers(0, 101, ROLL_BLOCK).tolist()
+            self._next_roll = 0
+        roll = self._rolls[self._next_roll]
+        self._next_roll += 1
+        return roll
+
+    def _hazard_constraints(self):
+        # Every breeze (stench) seen means a pit (wumpus) in at least one of the neighbours
+        # not ruled out. Returns (pit_constraints, wumpus_constraints) for FrontierInference.
+        pit_constraints = []
+        wumpus_constraints = []
+        for v, bits in self.percepts_at.items():
+            if bits & _BREEZE:
+                pit_constraints.append(tuple(c for c in self._neighbours(v) if not self.state.get(c, 0) & NO_PIT))
+            if bits & _STENCH:
+                wumpus_constraints.append(tuple(c for c in self._neighbours(v) if not self.state.get(c, 0) & NO_WUMPUS))
+        return pit_constraints, wumpus_constraints
+
+    def frontier_risk(self):
+        """
+        Returns:
+            dict[vec2D, float]: Probability that each frontier cell holds a pit or a wumpus.
+        """
+        pit_constraints, wumpus_constraints = self._hazard_constraints()
+        inference = self.inference
+        pits = inference.probabilities(pit_constraints, inference.pit_prior)
+        wumpi = inference.probabilities(wumpus_constraints, inference.wumpus_prior)
+
+        risk = {}
+        for c in self.frontier:
+            flags = self.state.get(c, 0)
+            if flags & (PIT | WUMPUS):
+                risk[c] = 1.0
+                continue
+            p = 0.0 if flags & NO_PIT else pits.get(c, inference.pit_prior)
+            w = 0.0 if flags & NO_WUMPUS else wumpi.get(c, inference.wumpus_prior)
+            risk[c] = 1 - (1 - p) * (1 - w)
+        return risk
+
+    def _explore_action(self):
+        # Heads for the nearest safe unvisited cell, or else for the frontier cells least likely to kill.
+        if self.unvisited_safe:
+            targets = self.unvisited_safe
+        elif self.frontier:
+            risk = self.frontier_risk()
+            lowest = min(risk.values())
+            targets = {c for c, r in risk.items() if r == lowest}
+        else:
+            return None
+        return first_action(self.position, self.orientation, self.planner.passable, targets)
+
     def immediate_square(self, orr):
         if orr == 'east':
-            return self.position + vec2D(1, 0)
+            return self.position.offset(1, 0)
         elif orr == 'west':
             # return the square to the west
-            return self.position + vec2D(-1, 0)
+            return self.position.offset(-1, 0)
         elif orr == 'north':
             # return the square to the north
-            return self.position + vec2D(0, 1)
+            return self.position.offset(0, 1)
         elif orr == 'south':
             # return the square to the south
-            return self.position + vec2D(0, -1)
+            return self.position.offset(0, -1)
 
     def compute_turn(self, map : Map):
 
-        percepts = map.get_percepts(self.position)
+        if self.metrics is not None:
+            return self._compute_turn_instrumented(map)
 
-        if percepts == 'died':
+        percepts = map.get_percept_bits(self.position)
+
+        if self.check_terminal(percepts):
+            return self.goal
+
+        # only update state when discovering world (looking for gold)
+        if self.goal == 'look':
+            self.update_state(percepts)
+
+        action = self.get_action(percepts)
+        self.apply_action(map, action)
+
+        return self.goal
+
+    def _compute_turn_instrumented(self, map : Map):
+        # compute_turn with every phase timed, kept separate so the plain path stays free of it
+        metrics = self.metrics
+
+        t0 = perf_counter()
+        percepts = map.get_percept_bits(self.position)
+        t1 = perf_counter()
+        metrics.add_phase('percepts', t1 - t0)
+
+        if self.check_terminal(percepts):
+            metrics.add_outcome(self.goal)
+            return self.goal
+
+        if self.goal == 'look':
+            t1 = perf_counter()
+            self.update_state(percepts)
+            metrics.add_phase('belief_update', perf_counter() - t1)
+
+        t2 = perf_counter()
+        action = self.get_action(percepts)
+        t3 = perf_counter()
+        self.apply_action(map, action)
+        t4 = perf_counter()
+
+        metrics.add_phase('action_selection', t3 - t2)
+        metrics.add_phase('map_mutation', t4 - t3)
+        metrics.add_turn(action)
+        return self.goal
+
+    def check_terminal(self, percepts):
+        """
+        Ends the game if the agent died or made it back to the start with the gold.
+        percepts is a percept string or percept bits.
+        Returns:
+            bool: True if the game is over.
+        """
+        self.last_action = None
+
+        if percept_bits(percepts) & DEADLY:
             self.goal = 'agent died'
             self.score -= 1000  # score for dying
-            return self.goal
+            return True
 
         if self.goal == 'go back' and self.position == self.start_position:
             # game won
             self.goal = 'agent won'
 
             self.score += 1000 # score for winning the game
-            return self.goal
+            return True
 
-        # only update state when discovering world (looking for gold)
-        if self.goal == 'look':
-            self.update_state(percepts)
+        return False
 
-        action = self.get_action(percepts)
+    def apply_action(self, map : Map, action : str):
+        """
+        Applies an action to the agent and the map, and counts the turn.
+        """
+        self.last_action = action
 
         if action == 'grab':
-            map.remove_gold(self.position)
-            self.goal = 'go back'
+            # grabbing where there is no gold does nothing
+            if map.remove_gold(self.position):
+                self.goal = 'go back'
 
         if action == 'forward':
             new_pos = self.immediate_square(self.orientation)
 
             if map.try_move(new_pos):
                 self.position = new_pos
-                self.state[self.position] = 'safe'
+                self._mark_safe(self.position)
                 self.score -= 1
 
         elif action == 'right':
@@ -205,9 +534,12 @@ class StateMachine:
             self.score -= 1
 
         elif action == 'shoot':
-            self.heard_scream = map.try_shoot(self.position, self.orientation)
+            # without the arrow, shooting does nothing but still takes the turn
+            if self.has_arrow:
+                self.heard_scream = map.try_shoot(self.position, self.orientation)
+                self.has_arrow = False
+                if self.heard_scream:
+                    self._forget_wumpi()
             self.score -= 1
 
         self.n += 1
-
-        return self.goal
\ No newline at end of file
@@ -0,0 +1,208 @@
+import argparse
+import csv
+import itertools
+import os
+from collections import defaultdict
+from multiprocessing import Pool, cpu_count
+
+from batch_runner import play_episode
+
+# Parameter sweeps and tournaments over map and agent parameters.
+#
+#   python sweep.py --sizes 4 6 8 --wumpi 1 2 --pits 2 4 --safe-forward 40 60 80 --episodes 1000 --out sweep.csv
+#
+# Every episode is one CSV row, appended as soon as its block of episodes is done.
+# The CSV is the checkpoint as well: running the same sweep again skips the episodes
+# already in the file, so an interrupted sweep resumes where it stopped. An episode
+# is identified by its configuration, its seed and its turn limit, so a run with
+# another --seed or --max-turns plays its own episodes instead of reusing others.
+#
+# Episode i of every configuration is seeded with seed + i, so configurations of
+# the same map parameters are compared on the same worlds.
+
+# parameters of a configuration, in CSV column order. The last three are StateMachine arguments
+PARAMETERS = ('Nx', 'Ny', 'nWumpus', 'nPits', 'mode', 'safe_forward', 'risky_forward')
+AGENT_PARAMETERS = ('mode', 'safe_forward', 'risky_forward')
+COLUMNS = PARAMETERS + ('max_turns', 'episode', 'seed', 'score', 'turns', 'outcome')
+
+
+def _fits(config):
+    # the same limits map_generator enforces
+    Nx, Ny = config['Nx'], config['Ny']
+    return config['nWumpus'] <= (Nx - 1) * (Ny - 1) and config['nWumpus'] + config['nPits'] + 2 <= Nx * Ny
+
+
+def make_grid(sizes, nWumpus, nPits, modes=('random',), safe_forward=(60,), risky_forward=(80,)):
+    """
+    Returns the cartesian product of the parameter values as a list of configurations.
+    Combinations whose wumpuses and pits don't fit on the map are left out.
+
+    Args:
+        sizes (list): Square map sizes, or (Nx, Ny) tuples.
+    Returns:
+        list[dict]: One dict per configuration, keyed by PARAMETERS.
+    """
+    configs = []
+    for size, w, p, mode, safe, risky in itertools.product(sizes, nWumpus, nPits, modes, safe_forward, risky_forward):
+        Nx, Ny = (size, size) if isinstance(size, int) else size
+        config = {'Nx': Nx, 'Ny': Ny, 'nWumpus': w, 'nPits': p, 'mode': mode,
+                  'safe_forward': safe, 'risky_forward': risky}
+        if _fits(config):
+            configs.append(config)
+    return configs
+
+
+def _key(config):
+    # configurations as they read back from the CSV
+    return tuple(str(config[p]) for p in PARAMETERS)
+
+
+def _turns(max_turns):
+    # the turn limit as it reads back from the CSV, csv writes None as ''
+    return '' if max_turns is None else str(max_turns)
+
+
+def _read_done(path):
+    # Episodes already in the results file, as (config key, seed, max_turns). A line cut
+    # short by an interruption is dropped, so appending continues on a clean line.
+    done = set()
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return done
+
+    with open(path, 'rb+') as f:
+        data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end != len(data):
+            f.truncate(end)
+    if end == 0:
+        return done
+
+    with open(path, newline='') as f:
+        reader = csv.DictReader(f)
+        if reader.fieldnames != list(COLUMNS):
+            raise ValueError(f"{path} has other columns than this sweep writes, use a new results file")
+        for row in reader:
+            done.add((tuple(row[p] for p in PARAMETERS), row['seed'], row['max_turns']))
+    return done
+
+
+def _play_block(job):
+    # plays a block of episodes of one configuration, returns their CSV rows
+    config, episodes, seed, max_turns = job
+    agent_args = {p: config[p] for p in AGENT_PARAMETERS}
+    rows = []
+    for i in episodes:
+        result = play_episode(config['Nx'], config['Ny'], config['nWumpus'], config['nPits'],
+                              seed + i, max_turns, agent_args=agent_args)
+        rows.append([config[p] for p in PARAMETERS]
+                    + [max_turns, i, seed + i, result['score'], result['turns'], result['outcome']])
+    return rows
+
+
+def run_sweep(configs, n_episodes: int, path: str, workers=None, seed: int = 0, max_turns=10000, block: int = 64):
+    """
+    Plays n_episodes episodes of every configuration on a process pool and appends
+    one row per episode to the CSV file at path, skipping the episodes it already holds.
+
+    Args:
+        configs (list[dict]): Configurations, see make_grid.
+        n_episodes (int): Episodes per configuration.
+        path (str): Results file, created with a header if missing.
+        workers (int): Number of worker processes. Defaults to the number of cores.
+        seed (int): Base seed, episode i is seeded with seed + i.
+        max_turns (int): Per episode turn limit.
+        block (int): Episodes of a configuration handed to a worker at once.
+    Returns:
+        int: The number of episodes played.
+    """
+    if workers is None:
+        workers = cpu_count()
+
+    done = _read_done(path)
+    jobs = []
+    for config in configs:
+        key = _key(config)
+        todo = [i for i in range(n_episodes) if (key, str(seed + i), _turns(max_turns)) not in done]
+        for k in range(0, len(todo), block):
+            jobs.append((config, todo[k:k + block], seed, max_turns))
+
+    played = 0
+    new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, 'a', newline='') as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(COLUMNS)
+
+        if workers <= 1:
+            results = map(_play_block, jobs)
+            pool = None
+        else:
+            pool = Pool(workers)
+            results = pool.imap_unordered(_play_block, jobs)
+
+        try:
+            for rows in results:
+                writer.writerows(rows)
+                f.flush()
+                played += len(rows)
+        finally:
+            if pool is not None:
+                pool.terminate()
+    return played
+
+
+def summarize(path):
+    """
+    Aggregates the results file per configuration and turn limit, best mean score first.
+    Returns:
+        list[dict]: The parameters and max_turns of every configuration with 'episodes',
+            'win_rate', 'death_rate', 'mean_score' and 'mean_turns'.
+    """
+    totals = defaultdict(lambda: [0, 0, 0, 0, 0])  # episodes, wins, deaths, score, turns
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            t = totals[tuple(row[p] for p in PARAMETERS + ('max_turns',))]
+            t[0] += 1
+            t[1] += row['outcome'] == 'agent won'
+            t[2] += row['outcome'] == 'agent died'
+            t[3] += int(row['score'])
+            t[4] += int(row['turns'])
+
+    summary = []
+    for key, (n, wins, deaths, score, turns) in totals.items():
+        entry = dict(zip(PARAMETERS + ('max_turns',), key))
+        entry.update(episodes=n, win_rate=wins / n, death_rate=deaths / n, mean_score=score / n, mean_turns=turns / n)
+        summary.append(entry)
+    summary.sort(key=lambda e: e['mean_score'], reverse=True)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep map and agent parameters of the Wumpus World.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[4])
+    parser.add_argument('--wumpi', type=int, nargs='+', default=[1])
+    parser.add_argument('--pits', type=int, nargs='+', default=[2])
+    parser.add_argument('--modes', nargs='+', default=['random'])
+    parser.add_argument('--safe-forward', type=int, nargs='+', default=[60])
+    parser.add_argument('--risky-forward', type=int, nargs='+', default=[80])
+    parser.add_argument('--episodes', type=int, default=1000, help="episodes per configuration")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-turns', type=int, default=10000)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--block', type=int, default=64, help="episodes per job")
+    parser.add_argument('--out', default='sweep.csv', help="results file, resumed if it exists")
+    parser.add_argument('--top', type=int, default=10, help="configurations to print, best first")
+    args = parser.parse_args(argv)
+
+    configs = make_grid(args.sizes, args.wumpi, args.pits, args.modes, args.safe_forward, args.risky_forward)
+    played = run_sweep(configs, args.episodes, args.out, args.workers, args.seed, args.max_turns, args.block)
+    print(f"{len(configs)} configurations, {played} episodes played")
+
+    for entry in summarize(args.out)[:args.top]:
+        params = ' '.join(f"{p}={entry[p]}" for p in PARAMETERS + ('max_turns',))
+        print(f"{params}  episodes={entry['episodes']} won={entry['win_rate']:.1%} "
+              f"died={entry['death_rate']:.1%} score={entry['mean_score']:.1f} turns={entry['mean_turns']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,50 @@
 import math
 
+# coordinates in this range are interned, so every in-grid cell maps to a single vec2D instance
+INTERN_MIN = -1
+INTERN_MAX = 1024
+
 # vec2D.py
 class vec2D:
 
     '''
     A simple 2D vector class that supports basic arithmetic operations and comparisons.
+    Instances are immutable, so they are safe to use as dict keys and to share.
     '''
-    def __init__(self, x = 0, y = 0):
-        self.x = x
-        self.y = y
+    __slots__ = ('x', 'y', '_hash')
+
+    _interned = {}
+
+    def __new__(cls, x = 0, y = 0):
+        key = (x, y)
+        v = cls._interned.get(key)
+        if v is not None:
+            return v
+
+        v = object.__new__(cls)
+        object.__setattr__(v, 'x', x)
+        object.__setattr__(v, 'y', y)
+        object.__setattr__(v, '_hash', hash(key))
+
+        if type(x) is int and type(y) is int and INTERN_MIN <= x < INTERN_MAX and INTERN_MIN <= y < INTERN_MAX:
+            cls._interned[key] = v
+        return v
+
+    def __setattr__(self, name, value):
+        raise AttributeError("vec2D is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("vec2D is immutable")
+
+    def __reduce__(self):
+        # rebuild through __new__ so unpickled vectors are interned as well
+        return (vec2D, (self.x, self.y))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
     def __str__(self):
         return f"vec2D({self.x}, {self.y})"
@@ -54,6 +90,8 @@ class vec2D:
 
     # Equality: obj1 == obj2
     def __eq__(self, other):
+        if self is other:
+            return True
         if isinstance(other, vec2D):
             return self.x == other.x and self.y == other.y
         return NotImplemented # Indicate that equality with other types is not supported
@@ -111,9 +149,28 @@ class vec2D:
         """
         Returns a hash value for the vec2D object.
         It's crucial that if v1 == v2, then hash(v1) == hash(v2).
-        A common way for simple objects is to hash a tuple of their immutable attributes.
+        The hash of the coordinate tuple is computed once in __new__ and cached.
+        """
+        return self._hash
+
+    # Fast paths for hot callers, avoiding intermediate vec2D objects
+
+    def offset(self, dx, dy):
+        """
+        Returns the vector (x + dx, y + dy), without building a vec2D for the offset.
         """
-        return hash((self.x, self.y))  # Hash a tuple of the coordinates
+        return vec2D(self.x + dx, self.y + dy)
+
+    def neighbours(self):
+        """
+        Returns the four adjacent squares as a tuple (north, south, east, west).
+        """
+        x = self.x
+        y = self.y
+        return vec2D(x, y + 1), vec2D(x, y - 1), vec2D(x + 1, y), vec2D(x - 1, y)
+
+    def as_tuple(self):
+        return self.x, self.y
 
     @staticmethod
     def dot(v1, v2):
@@ -0,0 +1,119 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import cpu_count
+import os
+
+from state_machine import StateMachine, agent_seed
+from map import Map
+
+# pygame is only imported inside the functions that render, so episodes can be
+# recorded on machines without it.
+
+# offscreen renderers of this process, by map size
+_renderers = {}
+
+
+def record_episode(Nx: int, Ny: int, nWumpus: int, nPits: int, seed=None, max_turns=None, mode='random'):
+    """
+    Plays an episode and records everything needed to render each turn.
+
+    Args:
+        seed: Seed of the map and the agent, see batch_runner.play_episode.
+        max_turns (int): Optional turn limit.
+        mode (str): Decision mode of the agent.
+    Returns:
+        dict: 'size' (Nx, Ny) and 'frames', a list of render_frame argument tuples, one per turn.
+    """
+    world = Map(Nx, Ny, nWumpus, nPits, seed)
+    agent = StateMachine(Nx, Ny, world, mode, rng=agent_seed(seed))
+
+    frames = []
+    goal = agent.goal
+    while True:
+        percepts = world.get_percepts(agent.position)
+        frames.append((dict(world.state), agent.position, agent.orientation, percepts,
+                       goal, dict(agent.state), agent.score))
+        if goal == 'agent won' or goal == 'agent died':
+            break
+        if max_turns is not None and agent.n >= max_turns:
+            break
+        goal = agent.compute_turn(world)
+
+    return {'size': (Nx, Ny), 'frames': frames}
+
+
+def _get_renderer(Nx, Ny):
+    from renderer import WumpusWorldRenderer
+
+    renderer = _renderers.get((Nx, Ny))
+    if renderer is None:
+        renderer = WumpusWorldRenderer(Nx, Ny, offscreen=True)
+        _renderers[(Nx, Ny)] = renderer
+    return renderer
+
+
+def export_episode(episode, path: str, format: str = 'png', frame_duration: int = 250):
+    """
+    Renders a recorded episode offscreen and saves it.
+
+    Args:
+        episode (dict): A recorded episode, see record_episode.
+        path (str): Directory for a PNG sequence (frame_00000.png, ...), or the .gif file to write.
+        format (str): 'png' or 'gif'. GIFs need Pillow.
+        frame_duration (int): Milliseconds per frame in GIFs.
+    Returns:
+        str: path
+    """
+    import pygame
+
+    if format not in ('png', 'gif'):
+        raise ValueError(f"unknown format '{format}'")
+    if format == 'gif':
+        try:
+            from PIL import Image
+        except ImportError:
+            raise ImportError("exporting GIFs requires Pillow (pip install pillow)")
+    else:
+        os.makedirs(path, exist_ok=True)
+
+    renderer = _get_renderer(*episode['size'])
+    images = []
+    for i, frame in enumerate(episode['frames']):
+        renderer.render_frame(*frame)
+        if format == 'png':
+            pygame.image.save(renderer.screen, os.path.join(path, f"frame_{i:05d}.png"))
+        else:
+            images.append(Image.fromarray(renderer.get_frame(copy=True)))
+
+    if format == 'gif' and images:
+        images[0].save(path, save_all=True, append_images=images[1:], duration=frame_duration, loop=0)
+    return path
+
+
+def _export_job(args):
+    Nx, Ny, nWumpus, nPits, seed, max_turns, path, format = args
+    episode = record_episode(Nx, Ny, nWumpus, nPits, seed, max_turns)
+    return export_episode(episode, path, format)
+
+
+def export_batch(Nx: int, Ny: int, nWumpus: int, nPits: int, seeds, out_dir: str,
+                 format: str = 'png', max_turns=None, workers=None):
+    """
+    Records and exports one episode per seed on a process pool. Every worker renders
+    offscreen, so this runs on headless machines.
+
+    Returns:
+        list[str]: The written paths, in the order of seeds.
+    """
+    if workers is None:
+        workers = cpu_count()
+    os.makedirs(out_dir, exist_ok=True)
+
+    suffix = '.gif' if format == 'gif' else ''
+    jobs = [(Nx, Ny, nWumpus, nPits, seed, max_turns, os.path.join(out_dir, f"episode_{seed}{suffix}"), format)
+            for seed in seeds]
+
+    if workers <= 1:
+        return [_export_job(job) for job in jobs]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_export_job, jobs))